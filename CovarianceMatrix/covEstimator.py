@@ -6,7 +6,8 @@ import numpy as np
 from tabulate import tabulate as tb
 from tqdm import tqdm
 from sklearn.covariance import empirical_covariance
-sys.path.append(os.path.join(os.path.abspath('..'), 'DataCleaning'))
+## the TAQ readers, TAQSummary and TAQCleaner live in DataCleaning, next to this directory
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'DataCleaning'))
 from TAQSummary import TAQSummary
 from TAQQuotesReader import TAQQuotesReader
 from TAQCleaner import TAQCleaner
@@ -26,16 +27,20 @@ class dataChecker(object):
         return self.taqS.tradeFileList, self.taqS.quoteFileList
 
     def checkDataCleaningQuote(self, fileName):
-        taqC = TAQCleaner(fileName, type='quote')
+        taqC = TAQCleaner(fileName, type='quote', columns=('millis', 'bidPrice', 'askPrice'))
         taqC.processPrices()
         taqC.processTimestamps()
         taqC.cleaningData()
         taqC.plotCleaningQuotesResultGraph()
 
 class covEstimator(object):
-    def __init__(self, workingDir, stockUniverseDir, freq = 5*60):
+    ## storeDir is the root of the ticker stores (see TAQTickerStore), None to read the per-date files
+    ## sharedMemory returns the per-date returns from the pool workers through shared memory
+    def __init__(self, workingDir, stockUniverseDir, freq = 5*60, storeDir = None, sharedMemory = False):
         self.workingDir = workingDir
         self.freq = freq
+        self.storeDir = storeDir
+        self.sharedMemory = sharedMemory
         self.stockUniverseDir = stockUniverseDir    
         self.stockUniverse = pd.read_hdf(stockUniverseDir,'sp500_list')
         self.stockUniverse = [i for i in self.stockUniverse if i!='CMCSA']
@@ -43,9 +48,9 @@ class covEstimator(object):
 
     def processReturnsForSingleTicker(self, Ticker):
         # initialize taqsummary written before for processing mid-quote returns with given frequency
-        taqS = TAQSummary(Ticker, self.workingDir, freq = self.freq)
+        taqS = TAQSummary(Ticker, self.workingDir, freq = self.freq, storeDir = self.storeDir)
         # compute mid-quote returns
-        taqS.computeStatForAllDatesWithFreq(ifCleaned=True, progress_bar = False)
+        taqS.computeStatForAllDatesWithFreq(ifCleaned=True, progress_bar = False, sharedMemory = self.sharedMemory)
         # process returns
         returns = pd.concat(taqS.quote_returns, axis=0).sort_index()
         returns.columns = [taqS.Ticker]
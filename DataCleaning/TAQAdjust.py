@@ -22,8 +22,10 @@ class TAQAdjust(object):
     # @method: adj_data_list - rewrite data of dates in one list by adjust factor.
     # @method: multi_adj_data - generate multi processes to implement data adjustment.
 
-    def __init__(self, work_path):
+    def __init__(self, work_path, codec=None):
         # @variable: work_path - path that contains data we want to make adjustment
+        # @variable: codec - TAQCodec or string such as 'gzip:1' or 'raw' for the adjusted files;
+        # the readers recognise any codec, so an intermediate tree can skip the slow gzip level 9
         # filePathName_Read
         columns = 'B,H,BA,BB'  # BA adj_p, BB adj_s
 
@@ -32,6 +34,7 @@ class TAQAdjust(object):
         self._adj_data = adj_sp500
         self._adj_law = None
         self._work_path = work_path
+        self._codec = codec
 
     def make_adj_law(self):
         # generate a dataframe that contains whether or not all stocks need to be adjusted
@@ -119,7 +122,7 @@ class TAQAdjust(object):
                         adj_s = 1
                         adj_p = 1
 
-                    Reader.rewrite_adj(file_write_path, adj_s, adj_p)
+                    Reader.rewrite_adj(file_write_path, adj_s, adj_p, self._codec)
                 sys.stdout.write("\r updating process:{0}/%d (%.2f%%)".format(iStock + 1) % (
                     nStocks, (iStock + 1) * 100.0 / nStocks))
                 sys.stdout.flush()
@@ -191,7 +194,7 @@ class TAQAdjust(object):
                         except IndexError as e:
                             adj_s = 1
                             adj_p = 1
-                        Reader.rewrite_adj(file_write_path, adj_s, adj_p)
+                        Reader.rewrite_adj(file_write_path, adj_s, adj_p, self._codec)
 
             sys.stdout.write("\r updating process:{0}/%d (%.2f%%)".format(iDate + 1) % (
                 nDates, (iDate + 1) * 100.0 / nDates))
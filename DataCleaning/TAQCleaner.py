@@ -1,5 +1,9 @@
 from TAQTradesReader import TAQTradesReader as tr
 from TAQQuotesReader import TAQQuotesReader as qr
+from TAQTime import millisToDatetimeIndex
+from TAQSummary import TAQSummary
+from TAQOutliers import writeOutliers, outliersPath
+from TAQManifest import TAQManifest, fileState
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 
@@ -10,25 +14,54 @@ import platform
 import os
 import time
 import sys
+import collections
+import bisect
+import math
+import traceback
+from numpy.lib.stride_tricks import sliding_window_view
 
 class TAQCleaner(object):
-    def __init__(self, filePathName, type=None):
+    ## columns restricts what the reader decodes, e.g. ('millis', 'bidPrice', 'askPrice')
+    ## for a quote cleaner that is only plotted; rewriteToFile needs every column
+    ## sessionWindow = (startMillis, endMillis) keeps only the ticks of that window
+    ## (e.g. (34200000, 57600000) for 9:30-16:00), the others are never materialized
+    def __init__(self, filePathName, type=None, columns=None, sessionWindow=None):
         self._filePathName = filePathName
+        ## the source as it was read, and its fileState once writeOutlierFile needs it
+        self._sourceStat = os.stat(filePathName)
+        self._sourceState = None
         ## dataReader
         if type == 'trade':
-            self.dataReader = tr(filePathName)
+            self.dataReader = tr(filePathName, columns=columns)
         elif type =='quote':
-            self.dataReader = qr(filePathName)
+            self.dataReader = qr(filePathName, columns=columns)
         else:
             raise ValueError('Data type is invalid')
         ## data type
         self.type = type
+        ## reader index bounds of the ticks being cleaned
+        if sessionWindow is None:
+            self._start, self._stop = 0, self.dataReader.getN()
+        else:
+            window = self.dataReader.slice(*sessionWindow)
+            self._start, self._stop = window.start, window.stop
         ## prices lst
         self.prices = None
         self.bidPrices = None
         self.askPrices = None
-        ## outlier timestamp lst
+        ## outlier timestamp lst, and the same outliers as a boolean mask over the prices
         self.outlierIdx = None
+        self.outlierMask = None
+        ## parameters the outliers were found with
+        self.K = None
+        self.gamma_multiplier = None
+        ## largest relative deviation of a price from the centre of its neighbourhood (see maxDeviation)
+        self.maxDeviation = None
+        ## maxDeviation of each K of the last cleaningSweep
+        self.maxDeviations = None
+        ## quotes rejected by filterQuotes before the rolling test, and how many by each rule
+        self.rejectedMask = None
+        self.filterCounts = None
         ## timestamp lst
         self.tsList = None
         self.rawTradesDF = None
@@ -36,72 +69,98 @@ class TAQCleaner(object):
         self.cleanedTradesDF = None
         self.cleanedQuotesDF = None
 
-    ## function to read in all the prices, for quote and trade type
+    ## function to read in all the prices, for quote and trade type, as float64 arrays
     ## if type is quote, the self.prices is mid price
     def processPrices(self):
+        window = slice(self._start, self._stop)
         if self.prices is None and self.type == 'trade':
-            self.prices = []
-            for i in range(self.dataReader.getN()):
-                ## add trade price
-                self.prices.append(self.dataReader.getPrice(i))   
+            self.prices = self.dataReader.getPriceArray()[window].astype(np.float64)
 
         if self.prices is None and self.type == 'quote':
-            self.prices = []
-            self.bidPrices = []
-            self.askPrices = []
-            for i in range(self.dataReader.getN()):
-                ## add bid
-                self.bidPrices.append(self.dataReader.getBidPrice(i))
-                ## add ask
-                self.askPrices.append(self.dataReader.getAskPrice(i))
-                ## add mid price
-                _midPrice = 1/2 * (self.dataReader.getAskPrice(i) +\
-                            self.dataReader.getBidPrice(i))
-                self.prices.append(_midPrice)                
+            self.bidPrices = self.dataReader.getBidPriceArray()[window].astype(np.float64)
+            self.askPrices = self.dataReader.getAskPriceArray()[window].astype(np.float64)
+            ## mid price
+            self.prices = 1/2 * (self.askPrices + self.bidPrices)
         return self.prices
 
-    ## read in all the timestamps and convert it to pandas timestamp
+    ## read in all the timestamps as a pandas DatetimeIndex, in one array operation
     def processTimestamps(self):
         self._tsYearMonthDate = datetime.datetime.fromtimestamp(
                 self.dataReader.getSecsFromEpocToMidn()
         )
         if self.tsList is None:
-            self.tsList = []
-            for i in range(self.dataReader.getN()):
-                self.tsList.append(
-                    ## Y-M-D + m-s
-                    pd.Timestamp(self._tsYearMonthDate+\
-                        datetime.timedelta(milliseconds = 
-                            self.dataReader.getMillisFromMidn(i)))
-                )
+            ## Y-M-D + m-s
+            self.tsList = millisToDatetimeIndex(self.dataReader.getSecsFromEpocToMidn(),
+                    self.dataReader.getMillisFromMidnArray()[self._start:self._stop])
     ## cleaning data based on given parameters
-    def cleaningData(self, K=21, gamma_multiplier = 0.00005):
+    ## a price is an outlier if it is more than 1.5 std + gamma_multiplier * mean away from
+    ## the mean of the K prices around it; computed with array operations (see rollingStats),
+    ## the result is the boolean outlierMask and the list of indices outlierIdx
+    ## quotes rejected by filterQuotes are outliers and are left out of the rolling test
+    ## method='median' uses the median and the median absolute deviation of the K prices
+    ## instead of their mean and std, which the outliers themselves cannot drag (see
+    ## rollingMedianMAD)
+    def cleaningData(self, K=21, gamma_multiplier = 0.00005, method='mean'):
         if self.prices is None:
             raise ValueError('prices need to be processed first.')
 
-        half_window = int((K-1)/2)
-        self.outlierIdx = []
-        for i in range(self.dataReader.getN()):
-            ## at the beginning of the day
-            if i<half_window:
-                left_bound = 0
-                right_bound = K
-            ## at the end of the day
-            elif self.dataReader.getN() - i < 3:
-                left_bound = self.dataReader.getN()-K
-                right_bound = self.dataReader.getN()
-            ## normal trading timestamp
-            else:
-                left_bound = i-half_window
-                right_bound = i+half_window+1
-            ## calculate neighbor std and mean
-            _std = np.std(self.prices[left_bound:right_bound])
-            _mean = np.mean(self.prices[left_bound:right_bound])
-            ## compare with current price
-            ## detect outlier
-            if abs(self.prices[i] - _mean) > 1.5*_std +\
-                    gamma_multiplier * _mean:
-                self.outlierIdx.append(i)
+        prices, expand = self._survivors()
+        stats = rollingMedianMAD(prices, K) if method == 'median' else rollingStats(prices, K)
+        self.setOutlierMask(expand(outlierMask(prices, K, gamma_multiplier, stats, method)), K, gamma_multiplier,
+                            maxDeviation(prices, stats))
+
+    ## reject the quotes no rolling test is needed for, in one array pass: crossed (ask < bid),
+    ## non-positive prices or sizes and, if spreadMultiple is given, spreads wider than
+    ## spreadMultiple times the rolling median spread over spreadWindow quotes (see
+    ## quoteSanityMask). Sets rejectedMask and filterCounts, used by the next cleaningData
+    def filterQuotes(self, spreadMultiple=None, spreadWindow=1001):
+        if self.type != 'quote':
+            raise ValueError('Quotes not available')
+        window = slice(self._start, self._stop)
+        self.rejectedMask, self.filterCounts = quoteSanityMask(
+                self.dataReader.getBidPriceArray()[window], self.dataReader.getAskPriceArray()[window],
+                self.dataReader.getBidSizeArray()[window], self.dataReader.getAskSizeArray()[window],
+                spreadMultiple, spreadWindow)
+        return self.filterCounts
+
+    ## the prices not rejected by filterQuotes, and the function that turns an outlier mask
+    ## over those into one over all the prices, the rejected ones being outliers
+    def _survivors(self):
+        prices = np.asarray(self.prices, dtype=np.float64)
+        rejected = self.rejectedMask
+        if rejected is None or not rejected.any():
+            return prices, lambda mask: mask
+
+        def expand(mask):
+            full = rejected.copy()
+            full[~rejected] = mask
+            return full
+        return prices[~rejected], expand
+
+    ## cleaning data for every K in Ks and gamma_multiplier in gamma_multipliers at once;
+    ## the rolling statistics are computed once per K and shared by its gammas.
+    ## Returns {(K, gamma_multiplier): outlier mask}, see setOutlierMask to use one;
+    ## maxDeviations is set to the maxDeviation of each K
+    def cleaningSweep(self, Ks, gamma_multipliers, method='mean'):
+        if self.prices is None:
+            raise ValueError('prices need to be processed first.')
+        prices, expand = self._survivors()
+        masks = {}
+        self.maxDeviations = {}
+        for K in Ks:
+            stats = rollingMedianMAD(prices, K) if method == 'median' else rollingStats(prices, K)
+            self.maxDeviations[K] = maxDeviation(prices, stats)
+            for gamma_multiplier in gamma_multipliers:
+                masks[(K, gamma_multiplier)] = expand(outlierMask(prices, K, gamma_multiplier, stats, method))
+        return masks
+
+    ## make mask the cleaning result, as if cleaningData had found it with K and gamma_multiplier
+    def setOutlierMask(self, mask, K=None, gamma_multiplier=None, maxDeviation=None):
+        self.outlierMask = mask
+        self.outlierIdx = np.flatnonzero(mask).tolist()
+        self.K = K
+        self.gamma_multiplier = gamma_multiplier
+        self.maxDeviation = maxDeviation
 
     def getRawTradesDataFrame(self):
         if self.type=='quote':
@@ -120,13 +179,12 @@ class TAQCleaner(object):
         if self.prices is None or self.tsList is None:
             self.processPrices()
             self.processTimestamps()
-        if self.outlierIdx is None:
+        if self.outlierMask is None:
             raise ValueError('Plese clean the data first.')
 
-        self.cleanedPrices = [self.prices[i] for i in range(self.dataReader.getN())\
-            if i not in self.outlierIdx]
-        self.cleanedTimeStamps = [self.tsList[i] for i in range(self.dataReader.getN())\
-            if i not in self.outlierIdx]
+        keep = ~self.outlierMask
+        self.cleanedPrices = np.asarray(self.prices)[keep]
+        self.cleanedTimeStamps = self.tsList[keep]
 
         self.cleanedTradesDF = pd.DataFrame({'Price':self.cleanedPrices,
                         'Time':self.cleanedTimeStamps})
@@ -152,17 +210,14 @@ class TAQCleaner(object):
         if self.prices is None or self.tsList is None:
             self.processPrices()
             self.processTimestamps()
-        if self.outlierIdx is None:
+        if self.outlierMask is None:
             raise ValueError('Plese clean the data first.')
 
-        self.cleanedPrices = [self.prices[i] for i in range(self.dataReader.getN())\
-            if i not in self.outlierIdx]
-        self.cleanedBidPrices = [self.bidPrices[i] for i in range(self.dataReader.getN())\
-            if i not in self.outlierIdx]
-        self.cleanedAskPrices = [self.askPrices[i] for i in range(self.dataReader.getN())\
-            if i not in self.outlierIdx]
-        self.cleanedTimeStamps = [self.tsList[i] for i in range(self.dataReader.getN())\
-            if i not in self.outlierIdx]
+        keep = ~self.outlierMask
+        self.cleanedPrices = np.asarray(self.prices)[keep]
+        self.cleanedBidPrices = np.asarray(self.bidPrices)[keep]
+        self.cleanedAskPrices = np.asarray(self.askPrices)[keep]
+        self.cleanedTimeStamps = self.tsList[keep]
 
         self.cleanedQuotesDF = pd.DataFrame({'Ask':self.cleanedAskPrices,
                         'Bid':self.cleanedBidPrices,
@@ -171,7 +226,10 @@ class TAQCleaner(object):
         return self.cleanedQuotesDF
 
     ## plot the data cleaning result
-    def plotCleaningTradesResultGraph(self, startTS=None, endTS=None, filePath=None, markersize = 5):
+    ## with decimate, each series is cut down to the lowest and highest point of every pixel
+    ## column (see decimateMinMax), which draws the same picture as every tick in a fraction
+    ## of the time; decimate=False plots every tick
+    def plotCleaningTradesResultGraph(self, startTS=None, endTS=None, filePath=None, markersize = 5, decimate = True):
         if self.type=='quote':
             raise ValueError('Trades not available')
 
@@ -193,17 +251,21 @@ class TAQCleaner(object):
                                     self.cleanedTradesDF['Time']<=endTS)]
         cleanedData.set_index('Time',inplace=True)
       
-        outliersTS = [self.tsList[i] for i in self.outlierIdx]
+        outliersTS = self.tsList[self.outlierMask]
+        outliersTS = outliersTS[(outliersTS >= startTS) & (outliersTS <= endTS)]
         fig, ax = plt.subplots(2,1,figsize=(20,12),sharex=True)
-        ax[0].scatter(rawData.index, rawData['Price'],s=markersize,color='deepskyblue')
+        buckets = int(fig.get_figwidth() * fig.dpi) if decimate else None
+        keep = decimateMinMax(rawData.index, rawData['Price'].to_numpy(), buckets)
+        ax[0].scatter(rawData.index[keep], rawData['Price'].to_numpy()[keep],s=markersize,color='deepskyblue')
         ax[0].legend(['Raw Trades Data'])
         ax[0].set_title('Before cleaning')
-        ax[1].scatter(cleanedData.index, cleanedData['Price'],s=markersize, color='deepskyblue')
+        keep = decimateMinMax(cleanedData.index, cleanedData['Price'].to_numpy(), buckets)
+        ax[1].scatter(cleanedData.index[keep], cleanedData['Price'].to_numpy()[keep],s=markersize, color='deepskyblue')
         ax[1].legend(['Cleaned Trades Data'])
         ax[1].set_title('After cleaning')
-        for x in outliersTS:
-            if x in rawData.index:
-                ax[0].axvline(x, color='r',ls=':',lw='0.5')
+        ## one artist for all the outliers
+        outliersTS = outliersTS[decimateMarkers(outliersTS, buckets)]
+        ax[0].vlines(outliersTS, 0, 1, transform=ax[0].get_xaxis_transform(), color='r',ls=':',lw=0.5)
         myFmt = mdates.DateFormatter('%H:%M:%S') # here you can format your datetick labels as desired
         plt.gca().xaxis.set_major_formatter(myFmt)
         fig.suptitle('Trades Data Cleaning Comparasion')
@@ -212,7 +274,7 @@ class TAQCleaner(object):
         #    plt.savefig(os.path.join(filePath,'cleaningComparasion_quotes'), format='jpg')
 
     ## plot the data cleaning result
-    def plotCleaningQuotesResultGraph(self, startTS=None, endTS=None, filePath=None, markersize = 5):
+    def plotCleaningQuotesResultGraph(self, startTS=None, endTS=None, filePath=None, markersize = 5, decimate = True):
         if self.type=='trade':
             raise ValueError('Quotes not available')
         if not startTS:
@@ -234,22 +296,24 @@ class TAQCleaner(object):
                                     self.cleanedQuotesDF['Time']<=endTS)]
         cleanedData.set_index('Time',inplace=True)
 
-        outliersTS = [self.tsList[i] for i in self.outlierIdx]
+        outliersTS = self.tsList[self.outlierMask]
+        outliersTS = outliersTS[(outliersTS >= startTS) & (outliersTS <= endTS)]
 
         fig, ax = plt.subplots(2,1,figsize=(20,12),sharex=True)
-        ax[0].step(rawData.index, rawData['Ask'], '*--',color='deepskyblue', linewidth=1, markersize=markersize, where='mid')
-        ax[0].step(rawData.index, rawData['Bid'], '*--',color='deepskyblue', linewidth=1, markersize=markersize,where='mid')
-        ax[0].scatter(rawData.index, rawData['Mid'],s=markersize, color='r')
-        ax[0].legend(['Raw Ask','Raw Bid','Raw Mid'])
+        buckets = int(fig.get_figwidth() * fig.dpi) if decimate else None
+        for axis, data, stage in [(ax[0], rawData, 'Raw'), (ax[1], cleanedData, 'Cleaned')]:
+            for column in ['Ask', 'Bid']:
+                keep = decimateMinMax(data.index, data[column].to_numpy(), buckets)
+                axis.step(data.index[keep], data[column].to_numpy()[keep], '*--',color='deepskyblue', linewidth=1,
+                          markersize=markersize, where='mid')
+            keep = decimateMinMax(data.index, data['Mid'].to_numpy(), buckets)
+            axis.scatter(data.index[keep], data['Mid'].to_numpy()[keep],s=markersize, color='r')
+            axis.legend([stage + ' Ask',stage + ' Bid',stage + ' Mid'])
         ax[0].set_title('Before cleaning')
-        ax[1].step(cleanedData.index, cleanedData['Ask'], '*--',color='deepskyblue',linewidth=1, markersize=markersize, where='mid')
-        ax[1].step(cleanedData.index, cleanedData['Bid'], '*--',color='deepskyblue',linewidth=1, markersize=markersize,where='mid')
-        ax[1].scatter(cleanedData.index, cleanedData['Mid'],s=markersize,color='r')
-        ax[1].legend(['Cleaned Ask','Cleaned Bid','Cleaned Mid'])
         ax[1].set_title('After cleaning')
-        for x in outliersTS:
-            if x in rawData.index:
-                ax[0].axvline(x, color='r',ls=':',lw='0.5')
+        ## one artist for all the outliers
+        outliersTS = outliersTS[decimateMarkers(outliersTS, buckets)]
+        ax[0].vlines(outliersTS, 0, 1, transform=ax[0].get_xaxis_transform(), color='r',ls=':',lw=0.5)
         myFmt = mdates.DateFormatter('%H:%M:%S') # here you can format your datetick labels as desired
         plt.gca().xaxis.set_major_formatter(myFmt)
         fig.suptitle('Quotes Data Cleaning Comparasion')
@@ -280,40 +344,468 @@ class TAQCleaner(object):
         return self.tsList
 
     def getOutLierPercent(self):
-        return len(self.outlierIdx)/len(self.prices)
+        return np.count_nonzero(self.outlierMask)/max(len(self.prices), 1)
+
+    ## the TAQCleaningReport of the cleaning result, which took seconds; with a session
+    ## window every count is of the ticks in the window
+    def getCleaningReport(self, seconds):
+        if self.outlierMask is None:
+            raise ValueError('Plese clean the data first.')
+        filterCounts = self.filterCounts or TAQQuoteFilterCounts(0, 0, 0, 0)
+        return TAQCleaningReport(self._filePathName, self.K, self.gamma_multiplier, self._stop - self._start,
+                                 len(self.outlierMask) - len(self.outlierIdx), self.getOutLierPercent(),
+                                 self.maxDeviation, *filterCounts, seconds)
 
     ## rewrite the cleaned file to given filePathName
-    def rewriteToFile(self, filePathName):
+    ## codec is a TAQWriter.TAQCodec or a string such as 'gzip:1'; gzip level 9 by default
+    def rewriteToFile(self, filePathName, codec=None):
         if self.type == 'quote':
             self.getCleanedQuotesDataFrame()
-            ts = []
-            bidSize = []
-            askSize = []
-            for i in range(self.dataReader.getN()):
-                if i not in self.outlierIdx:
-                    ts.append(self.dataReader.getMillisFromMidn(i))
-                    bidSize.append(self.dataReader.getBidSize(i))
-                    askSize.append(self.dataReader.getAskSize(i))
+            keep = ~self.outlierMask
+            window = slice(self._start, self._stop)
+            ts = self.dataReader.getMillisFromMidnArray()[window][keep]
+            bidSize = self.dataReader.getBidSizeArray()[window][keep]
+            askSize = self.dataReader.getAskSizeArray()[window][keep]
             self.dataReader.rewriteCleaned(ts,
                             bidSize, self.cleanedBidPrices,
-                             askSize,self.cleanedAskPrices,filePathName)
+                             askSize,self.cleanedAskPrices,filePathName, codec)
         elif self.type == 'trade':
             self.getCleanedTradesDataFrame()
-            ts = []
-            sizes = []
+            keep = ~self.outlierMask
+            window = slice(self._start, self._stop)
+            ts = self.dataReader.getMillisFromMidnArray()[window][keep]
+            sizes = self.dataReader.getSizeArray()[window][keep]
 
-            for i in range(self.dataReader.getN()):
-                if i not in self.outlierIdx:
-                    ts.append(self.dataReader.getMillisFromMidn(i))
-                    sizes.append(self.dataReader.getSize(i))
-    
             self.dataReader.rewriteCleaned(ts, self.cleanedPrices,sizes,
-                                            filePathName)
+                                            filePathName, codec)
         else:
             raise ValueError('data type is invalid')
 
+    ## write the outliers to filePathName as an outlier file (see TAQOutliers) instead of
+    ## rewriting the cleaned data; readers and TAQSummary apply it to the source on load
+    def writeOutlierFile(self, filePathName):
+        if self.outlierMask is None:
+            raise ValueError('Plese clean the data first.')
+        rows = self._start + np.flatnonzero(self.outlierMask)
+        ## hashed once, however many outlier files a sweep writes
+        if self._sourceState is None:
+            sourceState = fileState(self._filePathName)
+            if sourceState[:2] != (self._sourceStat.st_size, self._sourceStat.st_mtime_ns):
+                raise ValueError('%s changed while it was cleaned' % self._filePathName)
+            self._sourceState = sourceState
+        writeOutliers(filePathName, self._filePathName, self.K, self.gamma_multiplier,
+                      self.dataReader.getN(), self._start, self._stop, rows, self._sourceState)
+
+## what quoteSanityMask reports: the quotes each rule rejected, and all the quotes rejected
+TAQQuoteFilterCounts = collections.namedtuple('TAQQuoteFilterCounts',
+                                              ['crossed', 'nonPositive', 'wideSpread', 'rejected'])
+
+## boolean mask of the quotes to reject before the rolling test, and their TAQQuoteFilterCounts:
+## crossed markets (ask < bid), non-positive prices or sizes and, if spreadMultiple is given,
+## spreads wider than spreadMultiple times the median spread of the spreadWindow quotes around
+## them. The median is taken over the quotes the first two rules keep, and a quote can be
+## counted by both of those
+def quoteSanityMask(bidPrices, askPrices, bidSizes, askSizes, spreadMultiple=None, spreadWindow=1001):
+    bid = np.asarray(bidPrices, dtype=np.float64)
+    ask = np.asarray(askPrices, dtype=np.float64)
+    crossed = ask < bid
+    nonPositive = (bid <= 0) | (ask <= 0) | (np.asarray(bidSizes) <= 0) | (np.asarray(askSizes) <= 0)
+    rejected = crossed | nonPositive
+    wideSpread = np.zeros(len(bid), dtype=bool)
+    if spreadMultiple is not None and not rejected.all():
+        kept = np.flatnonzero(~rejected)
+        spread = ask[kept] - bid[kept]
+        median = pd.Series(spread).rolling(spreadWindow, center=True, min_periods=1).median().to_numpy()
+        ## a window of locked quotes has no spread to compare with
+        wideSpread[kept] = (median > 0) & (spread > spreadMultiple * median)
+        rejected |= wideSpread
+    counts = TAQQuoteFilterCounts(int(np.count_nonzero(crossed)), int(np.count_nonzero(nonPositive)),
+                                  int(np.count_nonzero(wideSpread)), int(np.count_nonzero(rejected)))
+    return rejected, counts
+
+## indices of the points to plot of the series y over the sorted x (numbers or timestamps):
+## x is cut into buckets columns of equal width and the lowest and highest point of each is
+## kept, in order, with the first and the last point. At one bucket per pixel the plot looks
+## the same as with every point, spikes included, but has at most 2 * buckets + 2 of them.
+## buckets=None keeps every point
+def decimateMinMax(x, y, buckets):
+    n = len(y)
+    if buckets is None or n <= 2 * buckets + 2:
+        return np.arange(n)
+    y = np.asarray(y)
+    bucket = _buckets(x, buckets)
+    ## x is sorted, so are the buckets: each one is a run of points
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ## the lowest and highest y of every run, then where they are in it
+    lows = np.minimum.reduceat(y, starts)
+    highs = np.maximum.reduceat(y, starts)
+    run = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, n]))
+    isLow = np.flatnonzero(y == lows[run])
+    isHigh = np.flatnonzero(y == highs[run])
+    ## the first point at the low and the high of each run
+    firstLow = isLow[np.r_[True, run[isLow][1:] != run[isLow][:-1]]]
+    firstHigh = isHigh[np.r_[True, run[isHigh][1:] != run[isHigh][:-1]]]
+    return np.unique(np.concatenate(([0, n - 1], firstLow, firstHigh)))
+
+## indices of the markers to draw at the sorted positions x, one per bucket of equal width:
+## more markers in the same pixel column would draw the same line
+def decimateMarkers(x, buckets):
+    if buckets is None or len(x) <= buckets:
+        return np.arange(len(x))
+    bucket = _buckets(x, buckets)
+    return np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+
+def _buckets(x, buckets):
+    ## bucket of each of the sorted positions x, of buckets of equal width
+    x = np.asarray(x)
+    if x.dtype.kind == 'M':
+        x = x.view(np.int64)
+    x = x.astype(np.float64)
+    span = x[-1] - x[0]
+    if span <= 0:
+        return np.zeros(len(x), dtype=np.int64)
+    return np.minimum(((x - x[0]) * (buckets / span)).astype(np.int64), buckets - 1)
+
+## bounds [left, right) of the neighbourhood of every tick in cleaningData, or of the
+## ticks i only: the first K ticks at the beginning of the day, the last K ticks for the
+## last two ticks (prices[N-K:N], so a negative N-K counts from the end as python slicing
+## does), otherwise the half_window ticks on each side, cut at the end of the day
+def cleaningWindows(N, K, i=None):
+    half_window = int((K-1)/2)
+    if i is None:
+        i = np.arange(N)
+    left = i - half_window
+    right = np.minimum(i + half_window + 1, N)
+    ## at the beginning of the day
+    begin = i < half_window
+    left[begin] = 0
+    right[begin] = min(K, N)
+    ## at the end of the day
+    end = ~begin & (N - i < 3)
+    left[end] = slice(N-K, N).indices(N)[0]
+    right[end] = N
+    return left, right
+
+## rows of neighbourhoods windowStats reduces at a time, which bounds its temporary arrays
+_STATS_BLOCK = 1 << 16
+
+## mean and standard deviation of values[left:right] for every pair of bounds, the very
+## numbers np.mean and np.std give on each slice. The neighbourhoods of one length are rows
+## of a sliding window view over the values, reduced a block of rows at a time, and numpy
+## reduces a row exactly as it does the slice, so a verdict never depends on how the stats
+## were computed. Running or prefix sums would be O(len(values)) whatever K is, but one
+## absurd tick leaves its rounding error in every later neighbourhood
+def windowStats(values, left, right):
+    values = np.asarray(values, dtype=np.float64)
+    left = np.asarray(left)
+    n = np.maximum(np.asarray(right) - left, 0)
+    ## an empty neighbourhood gives nan, as np.mean of an empty slice does
+    _mean = np.full(len(n), np.nan)
+    _std = np.full(len(n), np.nan)
+    for length in np.unique(n[n > 0]).tolist():
+        windows = sliding_window_view(values, length)
+        rows = np.flatnonzero(n == length)
+        for block in range(0, len(rows), _STATS_BLOCK):
+            index = rows[block:block + _STATS_BLOCK]
+            starts = left[index]
+            if np.all(np.diff(starts) == 1):
+                ## consecutive neighbourhoods, the usual case, are a view
+                blockWindows = windows[starts[0]:starts[-1] + 1]
+            else:
+                blockWindows = windows[starts]
+            _mean[index] = blockWindows.mean(axis=1)
+            _std[index] = blockWindows.std(axis=1)
+    return _mean, _std
+
+## mean and standard deviation of the prices in each cleaningWindows neighbourhood
+def rollingStats(prices, K):
+    left, right = cleaningWindows(len(prices), K)
+    return windowStats(prices, left, right)
+
+## outlier verdicts of prices whose neighbourhoods have the windowStats stats, the same
+## comparison as the tick by tick loop
+def _outlierVerdicts(prices, stats, gamma_multiplier):
+    _mean, _std = stats
+    with np.errstate(invalid='ignore'):
+        return np.abs(prices - _mean) > 1.5*_std + gamma_multiplier * _mean
+
+## boolean outlier mask of the cleaningData rule; stats are the rollingStats (with
+## method='median', the rollingMedianMAD) of the prices for K, computed here if not given,
+## so a gamma sweep can share them
+def outlierMask(prices, K, gamma_multiplier, stats=None, method='mean'):
+    prices = np.asarray(prices, dtype=np.float64)
+    if method == 'median':
+        if stats is None:
+            stats = rollingMedianMAD(prices, K)
+        _median, _mad = stats
+        with np.errstate(invalid='ignore'):
+            return np.abs(prices - _median) > 1.5*MAD_SCALE*_mad + gamma_multiplier * _median
+    if method != 'mean':
+        raise ValueError('Unknown cleaning method %s' % method)
+    if stats is None:
+        stats = rollingStats(prices, K)
+    return _outlierVerdicts(prices, stats, gamma_multiplier)
+
+## largest |price - centre| / centre over the prices, the centre being the neighbourhood mean
+## (or median) of stats, the rollingStats (or rollingMedianMAD) of the prices; NaN if there
+## are none. Compared to gamma_multiplier, it tells how far the worst tick of a file was off
+def maxDeviation(prices, stats):
+    centre = stats[0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        deviation = np.abs(np.asarray(prices, dtype=np.float64) - centre) / np.abs(centre)
+    deviation = deviation[np.isfinite(deviation)]
+    return float(deviation.max()) if len(deviation) else np.nan
+
+## the median absolute deviation of normally distributed prices times MAD_SCALE estimates
+## their std, so the median rule keeps the 1.5 of the mean rule
+MAD_SCALE = 1.4826
+
+## median and median absolute deviation of the prices in each cleaningWindows neighbourhood,
+## the same values np.median gives on each slice. One sorted copy of the neighbourhood is
+## moved along the day, each price entering and leaving it once by binary search; the MAD
+## is the middle of the distances to the median, which are sorted on each side of the
+## median and are read off the two sides by binary search too. O(N log K) comparisons
+def rollingMedianMAD(prices, K):
+    values = np.asarray(prices, dtype=np.float64).tolist()
+    N = len(values)
+    left, right = cleaningWindows(N, K)
+    _median = np.full(N, np.nan)
+    _mad = np.full(N, np.nan)
+    window = []
+    ## the window holds values[L:R]
+    L = R = 0
+    for i, (l, r) in enumerate(zip(left.tolist(), right.tolist())):
+        if r <= l:
+            continue
+        while R < r:
+            bisect.insort(window, values[R])
+            R += 1
+        while L < l:
+            del window[bisect.bisect_left(window, values[L])]
+            L += 1
+        while L > l:
+            L -= 1
+            bisect.insort(window, values[L])
+        while R > r:
+            R -= 1
+            del window[bisect.bisect_left(window, values[R])]
+        n = r - l
+        median = (window[(n - 1) // 2] + window[n // 2]) / 2
+        centre = bisect.bisect_left(window, median)
+        _median[i] = median
+        _mad[i] = (_kthDistance(window, centre, median, (n - 1) // 2) +
+                   _kthDistance(window, centre, median, n // 2)) / 2
+    return _median, _mad
+
+## k-th smallest (from 0) of |window - median| for the sorted window, centre being the first
+## position at or above the median: the distances read from centre - 1 down and from centre
+## up are both sorted, so it is the k-th of two sorted sequences, found by binary search on
+## how many come from the lower side
+def _kthDistance(window, centre, median, k):
+    lo = max(0, k + 1 - (len(window) - centre))
+    hi = min(k + 1, centre)
+    while lo < hi:
+        i = (lo + hi) // 2
+        ## taking i from below and k + 1 - i from above: one more from below if its next is closer
+        if median - window[centre - 1 - i] < window[centre + k - i] - median:
+            lo = i + 1
+        else:
+            hi = i
+    below = median - window[centre - lo] if lo > 0 else -np.inf
+    above = window[centre + k - lo] - median if lo < k + 1 else -np.inf
+    return max(below, above)
+
+
+class TAQStreamCleaner(object):
+    '''
+    The cleaningData rule applied to a stream of prices, for a live or replayed
+    feed, without ever holding the day.
+
+    push takes the next price or array of prices and returns the verdicts
+    (True for an outlier) of the ticks that became decidable, in tick order; a
+    tick is decidable once the half_window ticks after it (and at least two,
+    which rules out the end of the day rule) have arrived. pushTick does the
+    same for one price and returns a list, without any array overhead. close
+    returns the verdicts of the last ticks, under the end of the day rule.
+
+    The last prices are kept in a ring buffer of fewer than 4K slots, and
+    the sum and sum of squares of the current neighbourhood are updated as it
+    slides, in O(1) per tick. They are centred on a reference price and
+    recomputed every K ticks, which bounds their rounding error; a tick whose
+    distance to the threshold is within that bound is decided again with
+    np.mean and np.std of its neighbourhood, so the verdicts are the same as
+    outlierMask on the whole day. An array of K prices or more is decided
+    with the exact array statistics of the batch cleaner instead.
+
+    pushTick costs a few Python calls per tick, about 0.45M ticks/s on one
+    core, and is meant for feeds that must decide every tick as it comes.
+    For throughput, push arrays: chunks of 256 prices reach about 1.2M
+    ticks/s and chunks of 1024 about 3M, with the same verdicts.
+    '''
+
+    def __init__(self, K=21, gamma_multiplier=0.00005):
+        self.K = K
+        self.gamma_multiplier = gamma_multiplier
+        self._half_window = int((K-1)/2)
+        self._lag = max(self._half_window, 2)
+        ## length of a neighbourhood away from both ends of the day
+        self._size = 2 * self._half_window + 1
+        ## ring buffer, tick j in slot j & _mask; it holds every tick an undecided
+        ## neighbourhood or the end of the day rule can still reach
+        size = 1
+        while size < K + self._lag + 2:
+            size *= 2
+        self._ring = [0.0] * size
+        self._mask = size - 1
+        ## ticks pushed, and the first tick without a verdict
+        self._n = 0
+        self._next = 0
+        ## sums of the prices of the neighbourhood of tick _sumsOf centred on _reference,
+        ## the largest centred price they took in, and ticks slid since they were computed
+        self._sumsOf = None
+        self._reference = 0.0
+        self._sum = 0.0
+        self._sumSquares = 0.0
+        self._largest = 0.0
+        self._slid = 0
+        ## how far a threshold comparison made from the sums can be from the loop's
+        self._tolerance = 0.0
+
+    def push(self, prices):
+        prices = np.atleast_1d(np.asarray(prices, dtype=np.float64))
+        if len(prices) < self.K:
+            verdicts = []
+            for price in prices.tolist():
+                verdicts.extend(self.pushTick(price))
+            return np.array(verdicts, dtype=bool)
+        K, h = self.K, self._half_window
+        n, N = self._n, self._n + len(prices)
+        ## the ticks still held that the neighbourhoods of the undecided ticks reach
+        first = max(0, min(self._next - h, n - K))
+        values = np.concatenate((self._window(first, n), prices))
+        stop = max(N - self._lag, self._next)
+        i = np.arange(self._next, stop)
+        begin = i < h
+        left = np.where(begin, 0, i - h) - first
+        right = np.where(begin, K, i + h + 1) - first
+        verdicts = _outlierVerdicts(values[i - first], windowStats(values, left, right), self.gamma_multiplier)
+        tail = prices[-len(self._ring):].tolist()
+        for j, price in enumerate(tail, N - len(tail)):
+            self._ring[j & self._mask] = price
+        self._n, self._next, self._sumsOf = N, stop, None
+        return verdicts
+
+    def pushTick(self, price):
+        n = self._n
+        self._ring[n & self._mask] = price
+        self._n = n = n + 1
+        i = self._next
+        if i == n - self._lag - 1 and self._sumsOf == i - 1 and self._slid < self.K:
+            ## the steady state: one more tick decidable, and the sums slide by one
+            self._next = i + 1
+            return [self._verdict(i, True)]
+        if n < self.K:
+            ## the first ticks of the day need the first K
+            return []
+        verdicts = []
+        for i in range(i, n - self._lag):
+            if i < self._half_window:
+                ## at the beginning of the day
+                verdicts.append(self._exactVerdict(i, 0, self.K))
+            elif self._sumsOf == i - 1 and self._slid < self.K:
+                verdicts.append(self._verdict(i, True))
+            else:
+                self._resetSums(i)
+                verdicts.append(self._verdict(i, False))
+            self._next = i + 1
+        return verdicts
+
+    def close(self):
+        N = self._n
+        verdicts = []
+        if self._next < N:
+            left, right = cleaningWindows(N, self.K, np.arange(self._next, N))
+            for i, l, r in zip(range(self._next, N), left.tolist(), right.tolist()):
+                verdicts.append(self._exactVerdict(i, l, r))
+        self._next = N
+        return np.array(verdicts, dtype=bool)
+
+    def getN(self):
+        return self._n
+
+    def _window(self, left, right):
+        ## prices of ticks [left, right) as an array, the slice the tick by tick loop took
+        ring, mask = self._ring, self._mask
+        return np.array([ring[j & mask] for j in range(left, right)], dtype=np.float64)
+
+    def _exactVerdict(self, i, left, right):
+        window = self._window(left, right)
+        _mean = np.mean(window)
+        return bool(abs(self._ring[i & self._mask] - _mean) > 1.5*np.std(window) +\
+                self.gamma_multiplier * _mean)
+
+    def _verdict(self, i, slide):
+        ## verdict of tick i from the sums, first slid from the neighbourhood of tick i - 1
+        ## if slide is set; only a tick within the tolerance of the threshold is decided again
+        ring, mask, h = self._ring, self._mask, self._half_window
+        reference = self._reference
+        if slide:
+            entering = ring[(i + h) & mask] - reference
+            leaving = ring[(i - h - 1) & mask] - reference
+            self._sum += entering - leaving
+            self._sumSquares += entering * entering - leaving * leaving
+            self._slid += 1
+            if abs(entering) > self._largest:
+                self._largest = abs(entering)
+                self._setTolerance()
+            self._sumsOf = i
+        centredMean = self._sum / self._size
+        _mean = reference + centredMean
+        _var = self._sumSquares / self._size - centredMean * centredMean
+        deviation = abs(ring[i & mask] - _mean)
+        threshold = 1.5 * math.sqrt(_var if _var > 0.0 else 0.0) + self.gamma_multiplier * _mean
+        if abs(deviation - threshold) <= self._tolerance:
+            return self._exactVerdict(i, i - h, i + h + 1)
+        return deviation > threshold
+
+    def _resetSums(self, i):
+        ## the sums of the neighbourhood of tick i, recomputed from the ring and centred on its price
+        ring, mask, h = self._ring, self._mask, self._half_window
+        reference = ring[i & mask]
+        total = totalSquares = largest = 0.0
+        for j in range(i - h, i + h + 1):
+            centred = ring[j & mask] - reference
+            total += centred
+            totalSquares += centred * centred
+            largest = max(largest, abs(centred))
+        self._reference, self._sum, self._sumSquares, self._largest = reference, total, totalSquares, largest
+        self._slid = 0
+        self._sumsOf = i
+        self._setTolerance()
+
+    def _setTolerance(self):
+        ## K slides of at most K + 2 terms no larger than largest leave the sums within
+        ## errorScale * largest (squared); np.mean and np.std in the loop are off by
+        ## as much again, on prices up to |reference| + largest
+        eps = np.finfo(np.float64).eps
+        size = self._size
+        errorScale = 16 * (self.K + 2) ** 2 * eps
+        largest, magnitude = self._largest, abs(self._reference) + self._largest
+        meanError = errorScale * magnitude / size
+        varError = errorScale * largest * largest / size + 4 * largest * meanError + meanError * meanError
+        ## and the rounding of the comparison itself, on a price, mean and threshold of at most
+        ## (3.5 + gamma_multiplier) magnitudes
+        self._tolerance = (1 + abs(self.gamma_multiplier)) * meanError + 1.5 * math.sqrt(varError) +\
+                32 * eps * (1 + abs(self.gamma_multiplier)) * magnitude
+
 ## Function tools to utilize TAQCleaner 
-def beginCleaning(path, K=21, gamma_multiplier=0.00005):
+## with outliersOnly, an outlier file is written next to where the cleaned file would go
+## (see TAQOutliers) instead of the cleaned file itself
+## with sanityFilter, quote files go through filterQuotes(spreadMultiple) first, which drops
+## crossed and non-positive quotes and, with spreadMultiple, wide spreads;
+## method is that of cleaningData. Returns the TAQCleaningReport of the file
+def beginCleaning(path, K=21, gamma_multiplier=0.00005, codec=None, sessionWindow=None, outliersOnly=False,
+                  spreadMultiple=None, method='mean', sanityFilter=True):
     start = time.time()
     readingPath = path[0]
     writingPath = path[1]
@@ -324,91 +816,306 @@ def beginCleaning(path, K=21, gamma_multiplier=0.00005):
     else:
         raise ValueError('Path name incorrect.')
     ## cleaning data   
-    cleaner = TAQCleaner(readingPath, type)
+    cleaner = TAQCleaner(readingPath, type, sessionWindow=sessionWindow)
     cleaner.processPrices()
     cleaner.processTimestamps()
-    cleaner.cleaningData(K=K, gamma_multiplier=gamma_multiplier)
+    if sanityFilter and type == 'quote':
+        cleaner.filterQuotes(spreadMultiple)
+    cleaner.cleaningData(K=K, gamma_multiplier=gamma_multiplier, method=method)
     #print('Cleaning consume {}s'.format(time.time()-start))
     start2 = time.time()
     ## write cleaned data to file
     parentfolder = os.path.dirname(writingPath)
 
-    if not os.path.exists(parentfolder):
-        os.makedirs(parentfolder)
-    cleaner.rewriteToFile(writingPath)
+    ## other workers may be creating it at the same time
+    os.makedirs(parentfolder, exist_ok=True)
+    if outliersOnly:
+        cleaner.writeOutlierFile(outliersPath(writingPath))
+    else:
+        cleaner.rewriteToFile(writingPath, codec)
     #print('Writing consumes {}s'.format(time.time()-start2))
+    return cleaner.getCleaningReport(time.time() - start)
     
-def parallel_computing(f, params_list, n_cores=10):
-    p = mp.ProcessPool(n_cores)
-    chunksize = int(len(params_list) / n_cores)
-    p.map(f, params_list, chunksize=chunksize)
+## path of the cleaned copy of readingPath (<stage>/<date>/<file>) for K and gamma_multiplier,
+## in the <stage>_cleaned_<K>_<gamma> directory TAQSummary.loadTradeData looks for.
+## readingPath must be under an adjusted, not yet cleaned stage (<type>_SP_Adj, with any
+## prefix or suffix such as a custom adjustment name), otherwise ValueError is raised
+def sweepPath(readingPath, K, gamma_multiplier):
+    dateDir, fileName = os.path.split(readingPath)
+    stageDir, date = os.path.split(dateDir)
+    parentDir, stage = os.path.split(stageDir)
+    type = 'trade' if 'trade' in stage else 'quote'
+    adjustedStage = TAQSummary.stageName(type)
+    if adjustedStage not in stage or TAQSummary.stageName(type, True) in stage:
+        raise ValueError('%s is not under a %s stage' % (readingPath, adjustedStage))
+    cleanedStage = stage.replace(adjustedStage, TAQSummary.stageName(type, True, K, gamma_multiplier), 1)
+    writingPath = os.path.join(parentDir, cleanedStage, date, fileName)
+    if os.path.abspath(writingPath) == os.path.abspath(readingPath):
+        raise ValueError('%s would be cleaned onto itself' % readingPath)
+    return writingPath
 
-## perform data cleaning with given parameters
-## we can choose for which ticker we want to clean
-## if target_Ticker is None, perform cleaning on all Tickers, which takes hours to complete
-def main(workingDir, K=21, gamma_multiplier=0.00005, target_Ticker = None):
+## clean one file for every (K, gamma_multiplier) of the grid Ks x gamma_multipliers:
+## the file is decoded and its prices and timestamps processed once, the rolling
+## statistics computed once per K, and one cleaned file (or with outliersOnly, one
+## outlier file) written per pair (see sweepPath). Returns the list of TAQCleaningReports of
+## the file, one per pair, and the outlier masks by (K, gamma_multiplier); every report has the
+## seconds the whole file took. sanityFilter and spreadMultiple are those of beginCleaning
+def beginSweep(readingPath, Ks, gamma_multipliers, codec=None, sessionWindow=None, outliersOnly=False,
+               spreadMultiple=None, method='mean', sanityFilter=True):
+    if 'trade' in readingPath:
+        type='trade'
+    elif 'quote' in readingPath:
+        type='quote'
+    else:
+        raise ValueError('Path name incorrect.')
+    ## the outputs first, so a path sweepPath refuses fails before any work
+    writingPaths = {(K, gamma_multiplier): sweepPath(readingPath, K, gamma_multiplier)
+                    for K in Ks for gamma_multiplier in gamma_multipliers}
+    start = time.time()
+    cleaner = TAQCleaner(readingPath, type, sessionWindow=sessionWindow)
+    cleaner.processPrices()
+    cleaner.processTimestamps()
+    if sanityFilter and type == 'quote':
+        cleaner.filterQuotes(spreadMultiple)
+    masks = cleaner.cleaningSweep(Ks, gamma_multipliers, method)
+    pairs = []
+    for (K, gamma_multiplier), mask in masks.items():
+        writingPath = writingPaths[(K, gamma_multiplier)]
+        os.makedirs(os.path.dirname(writingPath), exist_ok=True)
+        cleaner.setOutlierMask(mask, K, gamma_multiplier, cleaner.maxDeviations[K])
+        if outliersOnly:
+            cleaner.writeOutlierFile(outliersPath(writingPath))
+        else:
+            cleaner.rewriteToFile(writingPath, codec)
+        pairs.append(cleaner.getCleaningReport(None))
+    seconds = time.time() - start
+    return [report._replace(seconds=seconds) for report in pairs], masks
+
+## what a cleaning task returns: the file cleaned, the parameters, the number of ticks n cleaned
+## (those in the session window, if any), the number nOut of them left after cleaning, the
+## fraction of them that were outliers, the maxDeviation, the TAQQuoteFilterCounts of the quotes
+## filterQuotes rejected before the rolling test (counted among the outliers; all 0 for trades
+## or without the filter) and the seconds it took
+TAQCleaningReport = collections.namedtuple('TAQCleaningReport',
+                                           ['path', 'K', 'gamma_multiplier', 'n', 'nOut', 'outlierFraction',
+                                            'maxDeviation'] + list(TAQQuoteFilterCounts._fields) + ['seconds'])
+
+## the reports of a run as one DataFrame, a row per report, with the type, date and ticker of
+## each file taken from its path (<stage>/<date>/<TICKER>_trades.binRT), so a whole universe
+## can be sorted or grouped by outlier fraction or maxDeviation
+def cleaningSummary(reports):
+    summary = pd.DataFrame(list(reports), columns=TAQCleaningReport._fields)
+    dateDirs = [os.path.dirname(path) for path in summary['path']]
+    fileNames = [os.path.basename(path) for path in summary['path']]
+    summary.insert(1, 'type', ['quote' if 'quote' in name else 'trade' for name in fileNames])
+    summary.insert(2, 'date', [os.path.basename(dateDir) for dateDir in dateDirs])
+    summary.insert(3, 'ticker', [name.split('_')[0] for name in fileNames])
+    return summary
+
+## write the cleaningSummary of reports to filePathName, as an .npz file of one array per
+## column if it ends with .npz and as CSV otherwise. With previous, the path of an earlier
+## summary, its rows that reports do not replace (same values of keys) are carried over, so
+## the table covers every file cleaned so far and not only those of an incremental run;
+## rows of files that no longer exist are dropped, and the column thisRun is True for the
+## rows of reports only
+def writeCleaningSummary(reports, filePathName, previous=None, keys=('path',)):
+    summary = cleaningSummary(reports)
+    summary['thisRun'] = True
+    if previous is not None and os.path.exists(previous):
+        earlier = readCleaningSummary(previous)
+        replaced = earlier.set_index(list(keys)).index.isin(summary.set_index(list(keys)).index)
+        earlier = earlier[~replaced & earlier['path'].map(os.path.exists).to_numpy()].copy()
+        earlier['thisRun'] = False
+        summary = pd.concat([summary, earlier], ignore_index=True)
+    parentfolder = os.path.dirname(filePathName)
+    if parentfolder:
+        os.makedirs(parentfolder, exist_ok=True)
+    if filePathName.endswith('.npz'):
+        columns = {}
+        for column in summary.columns:
+            values = summary[column].to_numpy()
+            ## strings as a unicode array, which loads without allow_pickle
+            columns[column] = values.astype(str) if values.dtype == object else values
+        np.savez(filePathName, **columns)
+    else:
+        summary.to_csv(filePathName, index=False)
+    return summary
+
+## the table writeCleaningSummary wrote to filePathName
+def readCleaningSummary(filePathName):
+    if filePathName.endswith('.npz'):
+        with np.load(filePathName) as columns:
+            return pd.DataFrame({column: columns[column] for column in columns.files})
+    return pd.read_csv(filePathName, dtype={'date': str, 'ticker': str})
+
+## True if every output exists and is newer than readingPath, so the task can be skipped
+def isUpToDate(readingPath, outputPaths):
+    inputTime = os.path.getmtime(readingPath)
+    for outputPath in outputPaths:
+        if not os.path.exists(outputPath) or os.path.getmtime(outputPath) < inputTime:
+            return False
+    return True
+
+## the data files of the trade and quote stages under workingDir/Dataset, optionally only
+## those whose name contains target_Ticker
+def sourceFiles(workingDir, target_Ticker = None):
     adj_suffix = '_SP_Adj'
-    type = 'trade'
-    tradeDir = os.path.join(workingDir,'Dataset',type+adj_suffix)
- 
-    tradeDateList = [i for i in os.listdir(tradeDir) if os.path.isdir(
-                                                            os.path.join(tradeDir, i)
-                                                             )]
-    trade_params = []
-    tradeDateList.sort()
-    for _date in tradeDateList:
-        tickerOnGivenDate = os.listdir(os.path.join(tradeDir,_date))
-        ## create a reading and writing dir for beginCleaning function to perform cleaning
-        for _ticker in tickerOnGivenDate:
-            trade_params.append(
-                [os.path.join(tradeDir,_date,_ticker),
-                os.path.join(tradeDir+'_cleaned',_date,_ticker)] 
-            )
-
-    type = 'quote'
-    quoteDir = os.path.join(workingDir ,'Dataset'\
-                    , type + adj_suffix)
-    quoteDateList = [i for i in os.listdir(quoteDir) if os.path.isdir( os.path.join(quoteDir,i) )]
-    quote_params = []
-    quoteDateList.sort()
-    for _date in quoteDateList:
-        tickerOnGivenDate = os.listdir( os.path.join(quoteDir,_date) )
-        ## create a reading and writing dir for beginCleaning function to perform cleaning
-        for _ticker in tickerOnGivenDate:
-            quote_params.append( 
-                [os.path.join(quoteDir,_date,_ticker),
-                os.path.join(quoteDir+'_cleaned',_date,_ticker)]
-            )
-        
-    
+    paths = []
+    for type in ['trade', 'quote']:
+        stageDir = os.path.join(workingDir, 'Dataset', type + adj_suffix)
+        dateList = [i for i in os.listdir(stageDir) if os.path.isdir(os.path.join(stageDir, i))]
+        dateList.sort()
+        for _date in dateList:
+            for _ticker in sorted(os.listdir(os.path.join(stageDir, _date))):
+                if target_Ticker is None or target_Ticker in _ticker:
+                    paths.append(os.path.join(stageDir, _date, _ticker))
+    return paths
+
+## a task runTasks could not run: its input and the traceback of the error
+TAQTaskFailure = collections.namedtuple('TAQTaskFailure', ['path', 'error'])
+
+def _runTask(task):
+    index, function, args, readingPath = task
+    ## the error of a task is handed back, so the pool goes on with the others
+    try:
+        ## the input is hashed by the worker, before it is read for cleaning
+        state = None if readingPath is None else fileState(readingPath)
+        return index, state, function(*args), None
+    except Exception:
+        return index, None, None, traceback.format_exc()
+
+## run tasks, a list of (readingPath, outputPaths, function, args), on one pool of n_cores
+## workers (one per core by default). Tasks already done are skipped, so an interrupted
+## run picks up where it stopped; the others are handed out largest input first, so no
+## worker is left with a big file at the end. Without a manifest a task is done when its
+## outputs are all newer than its input; with a TAQManifest, when its input content and
+## parameters (args after the first) are those recorded, and the outputs of inputs gone
+## since are deleted first.
+## function(*args) returns a TAQCleaningReport, or a tuple starting with a list of them (see
+## beginSweep), and the reports are returned in completion order. A task that raises is
+## reported as it fails and appended to failures, if given, as a TAQTaskFailure; the others
+## go on, and as it is not recorded as done, the next run tries it again
+def runTasks(tasks, n_cores = None, description = 'cleaning', progress_bar = True, manifest = None,
+             failures = None):
     from tqdm import tqdm
     import multiprocessing as mp
-    n_core = 10
-    pool1 = mp.Pool(n_core)
-    pool2 = mp.Pool(n_core)
-    
-    ## if target_Ticker is specified
-    ## only clean the data for target Ticker
-    if target_Ticker is not None:
-        trade_params = [i for i in trade_params if target_Ticker in i[0]]
-        quote_params = [j for j in quote_params if target_Ticker in j[0]]
-
-    print(trade_params[0])
-    pbar1 = tqdm(total = len(trade_params))
-    pbar1.set_description('trade cleaning')
-    update1 = lambda *args : pbar1.update()
-
-    pbar2 = tqdm(total = len(quote_params))
-    pbar2.set_description('quote cleaning')
-    update2 = lambda *args : pbar2.update()
-    
-    for _param1,_param2 in zip(trade_params,quote_params):
-        pool1.apply_async(beginCleaning,(_param1,K,gamma_multiplier),callback=update1)
-        pool2.apply_async(beginCleaning, (_param2,K,gamma_multiplier),callback=update2)
-    pool1.close()
-    pool1.join()
-    pool2.close()
-    pool2.join()
+    if manifest is None:
+        pending = [task for task in tasks if not isUpToDate(task[0], task[1])]
+    else:
+        manifest.removeOrphans()
+        pending = [task for task in tasks if not manifest.isCurrent(task[0], task[1], task[3][1:])]
+    pending.sort(key=lambda task: os.path.getsize(task[0]), reverse=True)
+    if n_cores is None:
+        n_cores = os.cpu_count()
+    pbar = tqdm(total = len(pending), disable = not progress_bar)
+    pbar.set_description(description)
+    reports = []
+    start = time.time()
+    ticks = 0
+    work = [(index, task[2], task[3], None if manifest is None else task[0]) for index, task in enumerate(pending)]
+    try:
+        with mp.Pool(min(n_cores, max(len(pending), 1))) as pool:
+            for index, state, result, error in pool.imap_unordered(_runTask, work):
+                readingPath, outputPaths, _, args = pending[index]
+                if error is not None:
+                    pbar.write('%s failed: %s' % (readingPath, error.strip().splitlines()[-1]))
+                    if failures is not None:
+                        failures.append(TAQTaskFailure(readingPath, error))
+                    pbar.update()
+                    continue
+                if manifest is not None:
+                    manifest.record(readingPath, state, args[1:], outputPaths)
+                fileReports = [result] if isinstance(result, TAQCleaningReport) else result[0]
+                reports.extend(fileReports)
+                report = fileReports[0]
+                ticks += report.n
+                pbar.set_postfix(file=os.path.basename(report.path),
+                                 file_rate='%.0f ticks/s' % (report.n / max(report.seconds, 1e-9)),
+                                 rate='%.0f ticks/s' % (ticks / max(time.time() - start, 1e-9)))
+                pbar.update()
+    finally:
+        pbar.close()
+        ## what was done is kept even if the pool itself fails
+        if manifest is not None:
+            manifest.save()
+    return reports
+
+## where main and sweepMain write the summary of a run by default:
+## Dataset/cleaning_reports/<name>_<YYYYmmdd_HHMMSS_micros>.csv
+def defaultSummaryPath(workingDir, name):
+    stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    return os.path.join(workingDir, 'Dataset', 'cleaning_reports', '%s_%s.csv' % (name, stamp))
+
+## the latest summary written to defaultSummaryPath(workingDir, name), None if there is none
+def latestSummaryPath(workingDir, name):
+    reportDir = os.path.join(workingDir, 'Dataset', 'cleaning_reports')
+    if not os.path.isdir(reportDir):
+        return None
+    ## the stamps sort in time order
+    fileNames = sorted(fileName for fileName in os.listdir(reportDir)
+                       if fileName.startswith(name + '_') and fileName.endswith('.csv'))
+    return os.path.join(reportDir, fileNames[-1]) if fileNames else None
+
+## write the summary of a run of main or sweepMain, merged with the one before it (see
+## writeCleaningSummary): the latest default one, or summaryPath itself if given
+def _writeRunSummary(reports, workingDir, name, summaryPath, keys):
+    if summaryPath is None:
+        previous, summaryPath = latestSummaryPath(workingDir, name), defaultSummaryPath(workingDir, name)
+    else:
+        previous = summaryPath
+    writeCleaningSummary(reports, summaryPath, previous, keys)
+
+## perform data cleaning with given parameters
+## we can choose for which ticker we want to clean
+## if target_Ticker is None, perform cleaning on all Tickers, which takes hours to complete;
+## the run is recorded in the TAQManifest manifestPath (Dataset/cleaning.manifest by default)
+## and files already cleaned with the same parameters since their content last changed are
+## skipped, so new dates or a few re-adjusted tickers only cost their own files and an
+## interrupted run can simply be started again. With sanityFilter, quote files are
+## pre-filtered by filterQuotes(spreadMultiple); method is that of cleaningData. Returns the TAQCleaningReport
+## of every file cleaned, also written as one table to summaryPath (see writeCleaningSummary;
+## defaultSummaryPath if not given) when any file was cleaned, with the rows of the previous
+## summary for the files skipped; files that failed are appended to failures as in runTasks
+def main(workingDir, K=21, gamma_multiplier=0.00005, target_Ticker = None, codec=None, sessionWindow=None,
+         outliersOnly=False, n_cores=None, progress_bar=True, manifestPath=None, spreadMultiple=None,
+         method='mean', summaryPath=None, sanityFilter=True, failures=None):
+    tasks = []
+    for readingPath in sourceFiles(workingDir, target_Ticker):
+        dateDir, fileName = os.path.split(readingPath)
+        stageDir, date = os.path.split(dateDir)
+        writingPath = os.path.join(stageDir + '_cleaned', date, fileName)
+        output = outliersPath(writingPath) if outliersOnly else writingPath
+        tasks.append((readingPath, [output], beginCleaning,
+                      ([readingPath, writingPath], K, gamma_multiplier, codec, sessionWindow, outliersOnly,
+                       spreadMultiple, method, sanityFilter)))
+    if manifestPath is None:
+        manifestPath = os.path.join(workingDir, 'Dataset', 'cleaning.manifest')
+    reports = runTasks(tasks, n_cores, 'cleaning', progress_bar, TAQManifest(manifestPath), failures)
+    if reports:
+        _writeRunSummary(reports, workingDir, 'cleaning', summaryPath, ('path',))
+    return reports
+
+## clean every file for the whole grid Ks x gamma_multipliers in one pass over the data,
+## instead of one main run per pair; outputs go to <type>_SP_Adj_cleaned_<K>_<gamma>, and the
+## run is recorded in the TAQManifest manifestPath (Dataset/sweep.manifest by default);
+## the reports, one per file and pair, are written to summaryPath as in main
+def sweepMain(workingDir, Ks, gamma_multipliers, target_Ticker = None, codec=None, sessionWindow=None,
+              outliersOnly=False, n_cores=None, progress_bar=True, manifestPath=None, spreadMultiple=None,
+              method='mean', summaryPath=None, sanityFilter=True, failures=None):
+    tasks = []
+    for readingPath in sourceFiles(workingDir, target_Ticker):
+        outputs = [sweepPath(readingPath, K, gamma_multiplier) for K in Ks for gamma_multiplier in gamma_multipliers]
+        if outliersOnly:
+            outputs = [outliersPath(output) for output in outputs]
+        tasks.append((readingPath, outputs, beginSweep,
+                      (readingPath, Ks, gamma_multipliers, codec, sessionWindow, outliersOnly,
+                       spreadMultiple, method, sanityFilter)))
+    if manifestPath is None:
+        manifestPath = os.path.join(workingDir, 'Dataset', 'sweep.manifest')
+    reports = runTasks(tasks, n_cores, 'cleaning sweep', progress_bar, TAQManifest(manifestPath), failures)
+    if reports:
+        _writeRunSummary(reports, workingDir, 'sweep', summaryPath, ('path', 'K', 'gamma_multiplier'))
+    return reports
 
 if __name__ == '__main__':
     workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1'
@@ -0,0 +1,149 @@
+'''
+Process-wide LRU cache of decoded TAQ columns.
+
+A research session decodes the same files over and over: the Dickey-Fuller
+test reads the files the Ljung-Box test just read, a notebook opens the same
+day again for every plot, and so on. TAQTradesReader and TAQQuotesReader go through this cache,
+so the second reader of a file gets the columns the first one decoded
+without inflating anything.
+
+Entries are keyed by the absolute path, size and mtime of the file, so a
+rewritten file is decoded afresh, and by the column. Cached columns are
+read-only arrays in the byte order of the file and are shared by every
+reader that asks for them. Once the cached columns exceed the byte budget
+the least recently used ones are dropped. The budget is kept in the
+TAQ_COLUMN_CACHE_BYTES environment variable, so multiprocessing workers
+inherit it (each worker has its own cache).
+
+The cache is off (a budget of 0) unless turned on, e.g. with
+setCacheBudget(SESSION_CACHE_BYTES) at the start of a research session:
+batch runs such as TAQCleaner.runTasks or TAQSummary read every file once,
+and a cache in each of their workers would only hold memory.
+'''
+import os
+import threading
+import collections
+from TAQColumnStream import TAQColumnStream, decodeColumns as _decodeColumns, toNative
+
+CACHE_BYTES_ENV = 'TAQ_COLUMN_CACHE_BYTES'
+DEFAULT_CACHE_BYTES = 0
+## a budget for an interactive session
+SESSION_CACHE_BYTES = 256 << 20
+
+## what getCacheStats reports; hits and misses count columns (and headers)
+TAQCacheStats = collections.namedtuple('TAQCacheStats',
+                                       ['hits', 'misses', 'evictions', 'nbytes', 'entries', 'budget'])
+
+## nominal size of a cached header, so headers are evicted like columns
+_HEADER_BYTES = 64
+
+_lock = threading.Lock()
+_entries = collections.OrderedDict()
+_nbytes = 0
+_hits = 0
+_misses = 0
+_evictions = 0
+
+
+def setCacheBudget(maxBytes):
+    os.environ[CACHE_BYTES_ENV] = str(int(maxBytes))
+    with _lock:
+        _evict()
+
+def getCacheBudget():
+    value = os.environ.get(CACHE_BYTES_ENV)
+    return DEFAULT_CACHE_BYTES if not value else int(value)
+
+def clearColumnCache():
+    global _nbytes
+    with _lock:
+        _entries.clear()
+        _nbytes = 0
+
+def resetCacheStats():
+    global _hits, _misses, _evictions
+    with _lock:
+        _hits = _misses = _evictions = 0
+
+def getCacheStats():
+    with _lock:
+        return TAQCacheStats(_hits, _misses, _evictions, _nbytes, len(_entries), getCacheBudget())
+
+def fileKey(filePathName):
+    stat = os.stat(filePathName)
+    return (os.path.abspath(filePathName), stat.st_size, stat.st_mtime_ns)
+
+def _get(key):
+    global _hits, _misses
+    with _lock:
+        value = _entries.get(key)
+        if value is None:
+            _misses += 1
+            return None
+        _entries.move_to_end(key)
+        _hits += 1
+        return value[0]
+
+def _put(key, value, nbytes):
+    global _nbytes
+    with _lock:
+        if nbytes > getCacheBudget():
+            return
+        if key in _entries:
+            _nbytes -= _entries.pop(key)[1]
+        _entries[key] = (value, nbytes)
+        _nbytes += nbytes
+        _evict()
+
+def _evict():
+    ## called with the lock held
+    global _nbytes, _evictions
+    budget = getCacheBudget()
+    while _entries and _nbytes > budget:
+        _nbytes -= _entries.popitem(last=False)[1][1]
+        _evictions += 1
+
+def readHeader(filePathName, columns):
+    '''
+    Return (secsFromEpocToMidn, N) of filePathName, from the cache if an
+    earlier reader already read it.
+    '''
+    if getCacheBudget() <= 0:
+        with TAQColumnStream(filePathName, columns) as stream:
+            return stream.getHeader()
+    key = fileKey(filePathName) + ('header',)
+    header = _get(key)
+    if header is None:
+        with TAQColumnStream(filePathName, columns) as stream:
+            header = stream.getHeader()
+        _put(key, header, _HEADER_BYTES)
+    return header
+
+def decodeColumns(filePathName, columns, wanted, nativeEndian=False):
+    '''
+    Return (header, arrays): the uint32 arrays of the column indices in
+    wanted, in that order, in the byte order of the file or, with
+    nativeEndian, in native order. Only the columns not already cached are
+    inflated, in one pass.
+    '''
+    if getCacheBudget() <= 0:
+        header, block = _decodeColumns(filePathName, columns, wanted)
+        if nativeEndian:
+            block = toNative(block)
+        return header, list(block)
+    key = fileKey(filePathName)
+    arrays = dict((index, _get(key + (index,))) for index in wanted)
+    missing = [index for index in wanted if arrays[index] is None]
+    header = _get(key + ('header',))
+    if missing or header is None:
+        header, block = _decodeColumns(filePathName, columns, missing)
+        _put(key + ('header',), header, _HEADER_BYTES)
+        for index, column in zip(missing, block):
+            column.setflags(write=False)
+            arrays[index] = column
+            _put(key + (index,), column, column.nbytes)
+    result = [arrays[index] for index in wanted]
+    if nativeEndian:
+        ## the cached arrays are shared, so they are converted by copy
+        result = [column.astype(column.dtype.newbyteorder('=')) for column in result]
+    return header, result
@@ -0,0 +1,264 @@
+'''
+Streaming decoder for the column-major TAQ binary layout.
+
+A TAQ file is a compressed stream holding an 8 byte header (seconds from epoc to
+midnight, N) followed by its columns one after the other, N 4-byte values
+each. TAQColumnStream inflates that stream incrementally and hands out one
+column, or a row range of a column, without ever materializing the whole
+uncompressed buffer. Its working memory is one chunk of chunkBytes plus
+whatever the caller asks it to return.
+
+Files may be gzip (the usual case), lzma, bz2 or raw uncompressed; the codec
+is recognised from the leading magic bytes (see sniffCodec).
+'''
+import os
+import gzip
+import bz2
+import lzma
+import struct
+import collections
+import numpy as np
+
+## column dtypes as stored on disk
+TRADE_COLUMNS = ('>i4', '>i4', '>f4')                  # millis, size, price
+QUOTE_COLUMNS = ('>i4', '>i4', '>f4', '>i4', '>f4')    # millis, bid size, bid price, ask size, ask price
+
+DEFAULT_CHUNK_BYTES = 1 << 20
+_HEADER = struct.Struct('>2i')
+
+## leading bytes of each compressed format; a bz2 stream starts with 'BZh', the block size
+## and then the magic of either its first block or the end of an empty stream
+_GZIP_MAGIC = b'\x1f\x8b'
+_XZ_MAGIC = b'\xfd7zXZ\x00'
+_BZ2_BLOCK_MAGIC = (b'\x31\x41\x59\x26\x53\x59', b'\x17\x72\x45\x38\x50\x90')
+
+## what peekFile reports; the millis are None for an empty file or when not asked for
+TAQFileInfo = collections.namedtuple('TAQFileInfo',
+                                     ['n', 'secsFromEpocToMidn', 'firstMillis', 'lastMillis'])
+
+## what the readers' slice returns: index bounds and column views of a time window
+TAQSlice = collections.namedtuple('TAQSlice', ['start', 'stop', 'columns'])
+
+
+class TAQColumnStream(object):
+    '''
+    Forward-only column reader over one compressed TAQ file.
+
+    Reads are cheapest in file order: asking for a column, or a row, behind
+    the current position rewinds and re-inflates the stream from the start.
+    If memoryLimit is given, any request that would allocate more than that
+    many bytes raises MemoryError before anything is allocated, so a pool
+    worker can be held to a fixed budget and fall back to iterColumn.
+    '''
+
+    def __init__(self, filePathName, columns, chunkBytes=DEFAULT_CHUNK_BYTES, memoryLimit=None):
+        self._filePathName = filePathName
+        self._columns = tuple(np.dtype(c) for c in columns)
+        self._chunkBytes = int(chunkBytes)
+        self._memoryLimit = memoryLimit
+        self._scratch = None
+        self._codec = sniffCodec(filePathName)
+        self._f = openCompressed(filePathName, self._codec)
+        self._pos = 0
+        self._header = _HEADER.unpack(self._read(_HEADER.size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+            self._scratch = None
+
+    def getHeader(self):
+        return self._header
+
+    def getN(self):
+        return self._header[1]
+
+    def getSecsFromEpocToMidn(self):
+        return self._header[0]
+
+    def getPosition(self):
+        # offset into the uncompressed stream
+        return self._pos
+
+    def _read(self, size):
+        buf = self._f.read(size)
+        if len(buf) != size:
+            raise EOFError('Truncated TAQ file %s' % self._filePathName)
+        self._pos += size
+        return buf
+
+    def _readInto(self, view):
+        done = 0
+        while done < len(view):
+            k = self._f.readinto(view[done:done + self._chunkBytes])
+            if not k:
+                raise EOFError('Truncated TAQ file %s' % self._filePathName)
+            done += k
+        self._pos += done
+
+    def _seek(self, offset):
+        if self._codec == 'raw':
+            ## nothing to inflate, jump straight there
+            self._f.seek(offset)
+            self._pos = offset
+            return
+        if offset < self._pos:
+            self._f.seek(0)
+            self._pos = 0
+        if self._scratch is None:
+            self._scratch = bytearray(self._chunkBytes)
+        scratch = memoryview(self._scratch)
+        while self._pos < offset:
+            self._readInto(scratch[:min(self._chunkBytes, offset - self._pos)])
+
+    def _checkMemory(self, nBytes):
+        if self._memoryLimit is not None and nBytes + self._chunkBytes > self._memoryLimit:
+            raise MemoryError('Reading %d bytes from %s exceeds the memory limit of %d bytes'
+                              % (nBytes, self._filePathName, self._memoryLimit))
+
+    def _rows(self, start, stop):
+        n = self.getN()
+        if stop is None or stop > n:
+            stop = n
+        start = min(max(start, 0), stop)
+        return start, stop
+
+    def readInto(self, column, out, start=0):
+        '''
+        Fill out with rows [start, start + len(out)) of column, as the raw
+        big-endian bytes stored in the file.
+        '''
+        n = self.getN()
+        if start + len(out) > n:
+            raise IndexError('Rows %d:%d out of range for N=%d' % (start, start + len(out), n))
+        self._seek(_HEADER.size + 4 * (column * n + start))
+        self._readInto(memoryview(out).cast('B'))
+        return out
+
+    def readColumn(self, column, start=0, stop=None):
+        '''
+        Return rows [start, stop) of column as a native-endian array.
+        '''
+        start, stop = self._rows(start, stop)
+        self._checkMemory(4 * (stop - start))
+        out = np.empty(stop - start, dtype=self._columns[column])
+        self.readInto(column, out, start)
+        return toNative(out)
+
+    def iterColumn(self, column, start=0, stop=None, chunkRows=None):
+        '''
+        Yield rows [start, stop) of column as consecutive native-endian
+        arrays of at most chunkRows rows (one chunk by default).
+        '''
+        start, stop = self._rows(start, stop)
+        if chunkRows is None:
+            chunkRows = max(self._chunkBytes // 4, 1)
+        self._checkMemory(4 * chunkRows)
+        for lo in range(start, stop, chunkRows):
+            out = np.empty(min(chunkRows, stop - lo), dtype=self._columns[column])
+            self.readInto(column, out, lo)
+            yield toNative(out)
+
+
+def decodeColumns(filePathName, columns, wanted, chunkBytes=DEFAULT_CHUNK_BYTES):
+    '''
+    Inflate filePathName once and return (header, block), where block is a
+    big-endian uint32 array with one row per index in wanted, in that order.
+    Columns not wanted are skipped and nothing after the last wanted column
+    is inflated.
+    '''
+    with TAQColumnStream(filePathName, columns, chunkBytes) as stream:
+        header = stream.getHeader()
+        block = np.empty((len(wanted), header[1]), dtype='>u4')
+        for row, column in enumerate(wanted):
+            stream.readInto(column, block[row])
+    return header, block
+
+def sniffCodec(filePathName):
+    '''
+    Return 'gzip', 'lzma', 'bz2' or 'raw' from the first bytes of the file.
+    A raw file starts with its header, whose first field would have to be a
+    date in 1986 to look like gzip; the bz2 check also looks at the block
+    magic because 'BZh' alone is a plausible April 2005 timestamp.
+    '''
+    with open(filePathName, 'rb') as f:
+        magic = f.read(10)
+    if magic[:2] == _GZIP_MAGIC:
+        return 'gzip'
+    if magic[:6] == _XZ_MAGIC:
+        return 'lzma'
+    if magic[:3] == b'BZh' and magic[3:4].isdigit() and magic[4:10] in _BZ2_BLOCK_MAGIC:
+        return 'bz2'
+    return 'raw'
+
+def openCompressed(filePathName, codec=None):
+    ## binary read handle that yields the uncompressed TAQ bytes
+    if codec is None:
+        codec = sniffCodec(filePathName)
+    if codec == 'gzip':
+        return gzip.open(filePathName, 'rb')
+    if codec == 'lzma':
+        return lzma.open(filePathName, 'rb')
+    if codec == 'bz2':
+        return bz2.open(filePathName, 'rb')
+    return open(filePathName, 'rb')
+
+def peekFile(filePathName, columns, timeSpan=True):
+    '''
+    Return the TAQFileInfo of filePathName without decoding its columns.
+    The header comes from the first inflated block. With timeSpan, the first
+    and last timestamps are read as well, which inflates the timestamp
+    column but nothing after it.
+    '''
+    with TAQColumnStream(filePathName, columns) as stream:
+        secs, n = stream.getHeader()
+        if not timeSpan or n == 0:
+            return TAQFileInfo(n, secs, None, None)
+        first = stream.readColumn(0, 0, 1)[0].item()
+        last = stream.readColumn(0, n - 1, n)[0].item()
+    return TAQFileInfo(n, secs, first, last)
+
+def countRecords(filePathName, columns):
+    '''
+    Return N without inflating anything: the gzip trailer stores the
+    uncompressed size mod 2**32 (ISIZE), and the layout is an 8 byte header
+    plus len(columns) columns of 4 bytes per record. Falls back to the header
+    when the trailer does not fit that layout, which is also what happens
+    once the size has wrapped past 4 GiB, and for lzma and bz2 files. A raw
+    file is counted from its size.
+    '''
+    codec = sniffCodec(filePathName)
+    if codec == 'raw':
+        isize = os.path.getsize(filePathName)
+    elif codec == 'gzip':
+        with open(filePathName, 'rb') as f:
+            f.seek(-4, os.SEEK_END)
+            isize = struct.unpack('<I', f.read(4))[0]
+    else:
+        return peekFile(filePathName, columns, timeSpan=False).n
+    rowBytes = 4 * len(columns)
+    if isize >= _HEADER.size and (isize - _HEADER.size) % rowBytes == 0:
+        return (isize - _HEADER.size) // rowBytes
+    return peekFile(filePathName, columns, timeSpan=False).n
+
+def toNative(array):
+    ## byteswap in place, so no second copy of the column is made
+    if not array.dtype.isnative:
+        array = array.byteswap(inplace=True).view(array.dtype.newbyteorder())
+    return array
+
+def limitWorkerMemory(maxBytes):
+    '''
+    Cap the address space of the calling process at maxBytes, so a runaway
+    worker fails with MemoryError instead of pushing the box into swap. Meant
+    as a multiprocessing.Pool initializer; POSIX only.
+    '''
+    import resource
+    resource.setrlimit(resource.RLIMIT_AS, (maxBytes, maxBytes))
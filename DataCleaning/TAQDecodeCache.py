@@ -0,0 +1,101 @@
+'''
+Opt-in on-disk cache of decoded TAQ files.
+
+The first time a reader inflates a *_trades.binRT or *_quotes.binRQ file
+while the cache is enabled, it writes an uncompressed, native-endian copy of
+the column block into the cache directory. Later readers memory-map that copy
+instead of gunzipping the source again.
+
+A sidecar is named after the absolute source path and records the source size
+and mtime, so it is silently rebuilt whenever the source file changes.
+
+The cache directory is kept in the TAQ_DECODE_CACHE_DIR environment variable,
+so multiprocessing workers started after enableDecodeCache() inherit it.
+'''
+import os
+import mmap
+import struct
+import hashlib
+import numpy as np
+from TAQWriter import replaceFile
+
+CACHE_DIR_ENV = 'TAQ_DECODE_CACHE_DIR'
+
+## magic, byte order, source size, source mtime (ns), secs from epoc, N, number of columns
+_MAGIC = b'TAQDC001'
+_HEADER = struct.Struct('<8s1s7xqq2ii')
+## column data starts on a page boundary so the mapping needs no copy
+_DATA_OFFSET = max(mmap.ALLOCATIONGRANULARITY, _HEADER.size)
+_BYTEORDER = b'<' if np.little_endian else b'>'
+
+
+def enableDecodeCache(cacheDir):
+    if not os.path.exists(cacheDir):
+        os.makedirs(cacheDir)
+    os.environ[CACHE_DIR_ENV] = os.path.abspath(cacheDir)
+
+def disableDecodeCache():
+    os.environ.pop(CACHE_DIR_ENV, None)
+
+def getDecodeCacheDir():
+    return os.environ.get(CACHE_DIR_ENV) or None
+
+def clearDecodeCache():
+    cacheDir = getDecodeCacheDir()
+    if cacheDir is None:
+        return
+    for name in os.listdir(cacheDir):
+        if name.endswith('.taqc'):
+            os.remove(os.path.join(cacheDir, name))
+
+def sidecarPath(filePathName, cacheDir=None):
+    if cacheDir is None:
+        cacheDir = getDecodeCacheDir()
+    key = hashlib.sha1(os.path.abspath(filePathName).encode('utf-8')).hexdigest()
+    return os.path.join(cacheDir, key + '.taqc')
+
+def loadColumns(filePathName, nColumns):
+    '''
+    Return (header, columns) for a valid sidecar of filePathName, where header
+    is (secsFromEpocToMidn, N) and columns is a read-only (nColumns, N) uint32
+    memmap. Return None when the cache is disabled or the sidecar is missing
+    or stale.
+    '''
+    cacheDir = getDecodeCacheDir()
+    if cacheDir is None:
+        return None
+    path = sidecarPath(filePathName, cacheDir)
+    try:
+        stat = os.stat(filePathName)
+        with open(path, 'rb') as f:
+            magic, byteorder, size, mtime, secs, n, ncols = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return None
+    if magic != _MAGIC or byteorder != _BYTEORDER or ncols != nColumns or \
+            size != stat.st_size or mtime != stat.st_mtime_ns:
+        return None
+    if n == 0:
+        return (secs, n), np.zeros((ncols, 0), dtype='=u4')
+    columns = np.memmap(path, dtype='=u4', mode='r', offset=_DATA_OFFSET, shape=(ncols, n))
+    return (secs, n), columns
+
+def storeColumns(filePathName, header, columns):
+    '''
+    Write a sidecar for filePathName holding the native-endian (nColumns, N)
+    uint32 block columns. Does nothing when the cache is disabled. The file is
+    written under a temporary name and renamed, so concurrent workers never
+    see a partial sidecar.
+    '''
+    cacheDir = getDecodeCacheDir()
+    if cacheDir is None:
+        return
+    stat = os.stat(filePathName)
+    columns = np.ascontiguousarray(columns, dtype='=u4')
+    head = _HEADER.pack(_MAGIC, _BYTEORDER, stat.st_size, stat.st_mtime_ns,
+                        header[0], header[1], columns.shape[0])
+
+    def write(out):
+        out.write(head)
+        out.write(b'\0' * (_DATA_OFFSET - len(head)))
+        columns.tofile(out)
+    replaceFile(sidecarPath(filePathName, cacheDir), write)
@@ -0,0 +1,157 @@
+'''
+Content manifest of a cleaning run, for incremental re-cleaning.
+
+A manifest remembers, for every input file a run cleaned, its size, mtime
+and content hash, the parameters it was cleaned with and the outputs
+written. The next run only cleans again the files whose content or
+parameters changed, or whose outputs went missing; a file whose mtime moved
+but whose content did not (a copy, a touch, TAQAdjust writing the same
+numbers) is recognised by its hash. Outputs of inputs that no longer exist,
+and outputs a run no longer writes, are deleted.
+
+The manifest is a text file of JSON lines, one per entry, paths relative to
+the manifest so the tree can be moved. Entries are appended as files finish,
+so an interrupted run keeps what it did; the last line of an input wins,
+and save rewrites the file with one line per input.
+'''
+import os
+import json
+import hashlib
+from TAQWriter import replaceFile
+
+
+def fileDigest(filePathName, chunkBytes=1 << 20):
+    ## hash of the bytes as stored, compressed or not
+    digest = hashlib.blake2b(digest_size=20)
+    with open(filePathName, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunkBytes), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def fileState(filePathName):
+    '''
+    Return (size, mtime_ns, hash) of a file; the stat is taken first, so a
+    file changed while it is hashed looks changed to the next run.
+    '''
+    stat = os.stat(filePathName)
+    return stat.st_size, stat.st_mtime_ns, fileDigest(filePathName)
+
+def _normalize(params):
+    ## the parameters as they read back from the manifest; objects such as a TAQCodec by repr
+    return json.loads(json.dumps(params, default=repr))
+
+
+class TAQManifest(object):
+    '''
+    The manifest in manifestPath, created empty if needed.
+    '''
+
+    def __init__(self, manifestPath):
+        self._path = os.path.abspath(manifestPath)
+        self._root = os.path.dirname(self._path)
+        self._entries = {}
+        if os.path.exists(self._path):
+            with open(self._path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        ## a line cut short by an interrupted run
+                        continue
+                    if entry.get('deleted'):
+                        self._entries.pop(entry['input'], None)
+                    else:
+                        self._entries[entry['input']] = entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _relative(self, path):
+        return os.path.relpath(os.path.abspath(path), self._root)
+
+    def _absolute(self, path):
+        return os.path.normpath(os.path.join(self._root, path))
+
+    def _append(self, entry):
+        directory = os.path.dirname(self._path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(self._path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+    def get(self, inputPath):
+        '''
+        The entry of inputPath, a dict with keys input, size, mtime_ns, hash,
+        params and outputs (paths as stored, relative to the manifest), or
+        None.
+        '''
+        return self._entries.get(self._relative(inputPath))
+
+    def isCurrent(self, inputPath, outputPaths, params):
+        '''
+        True if inputPath was cleaned into outputPaths with params and has
+        not changed since; only a file whose size is unchanged but whose mtime
+        moved is hashed.
+        '''
+        entry = self.get(inputPath)
+        if entry is None or entry['params'] != _normalize(params):
+            return False
+        if entry['outputs'] != [self._relative(path) for path in outputPaths]:
+            return False
+        for path in outputPaths:
+            if not os.path.exists(path):
+                return False
+        stat = os.stat(inputPath)
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime_ns != entry['mtime_ns']:
+            if fileDigest(inputPath) != entry['hash']:
+                return False
+            ## same content, remember the new mtime so it is not hashed again
+            entry['mtime_ns'] = stat.st_mtime_ns
+            self._append(entry)
+        return True
+
+    def record(self, inputPath, state, params, outputPaths):
+        ## state is the fileState of inputPath taken before it was cleaned
+        size, mtime_ns, digest = state
+        entry = {'input': self._relative(inputPath), 'size': size, 'mtime_ns': mtime_ns, 'hash': digest,
+                 'params': _normalize(params), 'outputs': [self._relative(path) for path in outputPaths]}
+        ## outputs an earlier run wrote and this one did not, e.g. a cleaned file
+        ## replaced by an outlier file, are orphans too
+        previous = self._entries.get(entry['input'])
+        if previous is not None:
+            for output in previous['outputs']:
+                if output not in entry['outputs'] and os.path.exists(self._absolute(output)):
+                    os.remove(self._absolute(output))
+        self._entries[entry['input']] = entry
+        self._append(entry)
+
+    def removeOrphans(self):
+        '''
+        Delete the outputs of every input that no longer exists, forget those
+        inputs, and return the list of outputs deleted.
+        '''
+        removed = []
+        for key, entry in list(self._entries.items()):
+            if os.path.exists(self._absolute(key)):
+                continue
+            for output in entry['outputs']:
+                output = self._absolute(output)
+                if os.path.exists(output):
+                    os.remove(output)
+                    removed.append(output)
+            del self._entries[key]
+            self._append({'input': key, 'deleted': True})
+        return removed
+
+    def save(self):
+        ## rewrite the manifest with one line per input, replacing the log of this run
+        directory = os.path.dirname(self._path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        def write(out):
+            for key in sorted(self._entries):
+                out.write(json.dumps(self._entries[key]) + '\n')
+        replaceFile(self._path, write, lambda tmpPath: open(tmpPath, 'w'))
@@ -0,0 +1,139 @@
+'''
+Outlier files: the result of a cleaning run without a cleaned copy of the data.
+
+TAQCleaner.rewriteToFile writes a recompressed second copy of every file to
+drop a percent or so of its ticks, once per (K, gamma_multiplier). An
+outlier file records the same result in a few bytes: which rows of the
+source file the cleaning kept. It sits where the cleaned copy would have
+been, under the same name plus OUTLIER_SUFFIX
+(trade_SP_Adj_cleaned_21_5e-05/<date>/<TICKER>_trades.binRT.outliers), so
+any number of parameter sets share one copy of the data tree:
+
+    header   magic, K, gamma_multiplier, N of the source, bounds [start,
+             stop) of the rows cleaned (the session window), number of
+             outliers, length of the source path, and the size, mtime_ns
+             and hash of the source when it was cleaned
+    source   path of the source file, relative to the outlier file
+    rows     sorted row numbers of the outliers in the source, as
+             little-endian uint32
+
+openOutliers gives back a reader over the source with the kept rows only,
+the same ticks a reader of the rewritten file would see. The source can be
+re-adjusted in place without changing its N, so openOutliers refuses an
+outlier file whose source is no longer the file it was written for.
+'''
+import os
+import struct
+import collections
+import numpy as np
+from TAQTradesReader import TAQTradesReader
+from TAQQuotesReader import TAQQuotesReader
+from TAQManifest import fileState, fileDigest
+from TAQWriter import replaceFile
+
+OUTLIER_SUFFIX = '.outliers'
+
+_MAGIC = b'TAQOL002'
+## magic, K, gamma_multiplier, N, start, stop, number of outliers, length of the source path,
+## size, mtime_ns and hash of the source
+_HEADER = struct.Struct('<8sidqqqqiqq20s')
+
+## what readOutliers returns; source is an absolute path, sourceState its (size, mtime_ns, hash)
+## as fileState gave it when the outlier file was written
+TAQOutliers = collections.namedtuple('TAQOutliers',
+                                     ['K', 'gamma_multiplier', 'n', 'start', 'stop', 'rows', 'source',
+                                      'sourceState'])
+
+
+def outliersPath(cleanedPath):
+    ## the outlier file standing in for the cleaned file cleanedPath
+    return cleanedPath + OUTLIER_SUFFIX
+
+def isOutliersPath(filePathName):
+    return filePathName.endswith(OUTLIER_SUFFIX)
+
+def writeOutliers(filePathName, sourcePathName, K, gamma_multiplier, n, start, stop, rows, sourceState=None):
+    '''
+    Write an outlier file: rows are the outliers among rows [start, stop)
+    of sourcePathName, which holds n rows. sourceState is the fileState of
+    the source as it was cleaned, taken now if not given. The file appears
+    under its final name only once complete.
+    '''
+    rows = np.unique(np.asarray(rows, dtype=np.int64))
+    if len(rows) and (rows[0] < start or rows[-1] >= stop):
+        raise ValueError('Outliers outside rows %d:%d' % (start, stop))
+    outDir = os.path.dirname(os.path.abspath(filePathName))
+    if not os.path.exists(outDir):
+        os.makedirs(outDir)
+    source = os.path.relpath(os.path.abspath(sourcePathName), outDir).encode('utf-8')
+    if sourceState is None:
+        sourceState = fileState(sourcePathName)
+    size, mtime_ns, digest = sourceState
+
+    def write(out):
+        out.write(_HEADER.pack(_MAGIC, K, gamma_multiplier, n, start, stop, len(rows), len(source),
+                               size, mtime_ns, bytes.fromhex(digest)))
+        out.write(source)
+        out.write(rows.astype('<u4'))
+    replaceFile(filePathName, write)
+
+def readOutliers(filePathName):
+    with open(filePathName, 'rb') as f:
+        header = f.read(_HEADER.size)
+        if header[:len(_MAGIC)] != _MAGIC:
+            if header.startswith(b'TAQOL'):
+                raise ValueError('%s was written by an older version and does not record its source; '
+                                 'clean it again' % filePathName)
+            raise ValueError('%s is not a TAQ outlier file' % filePathName)
+        if len(header) != _HEADER.size:
+            raise EOFError('Truncated TAQ outlier file %s' % filePathName)
+        _, K, gamma_multiplier, n, start, stop, count, sourceLength, size, mtime_ns, digest = _HEADER.unpack(header)
+        source = f.read(sourceLength).decode('utf-8')
+        rows = np.fromfile(f, dtype='<u4', count=count).astype(np.int64)
+    if len(rows) != count:
+        raise EOFError('Truncated TAQ outlier file %s' % filePathName)
+    source = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(filePathName)), source))
+    return TAQOutliers(K, gamma_multiplier, n, start, stop, rows, source, (size, mtime_ns, digest.hex()))
+
+def isStale(outliers):
+    '''
+    True if the source of outliers is no longer the file they were written
+    for. Size and mtime decide, as in TAQManifest; a file touched without a
+    change in size is hashed.
+    '''
+    size, mtime_ns, digest = outliers.sourceState
+    stat = os.stat(outliers.source)
+    if stat.st_size != size:
+        return True
+    if stat.st_mtime_ns == mtime_ns:
+        return False
+    return fileDigest(outliers.source) != digest
+
+def keptMask(outliers):
+    ## boolean mask over the rows of the source, True for the rows the cleaning kept
+    keep = np.zeros(outliers.n, dtype=bool)
+    keep[outliers.start:outliers.stop] = True
+    keep[outliers.rows] = False
+    return keep
+
+def countKept(outliers):
+    return outliers.stop - outliers.start - len(outliers.rows)
+
+def openOutliers(filePathName, columns=None, nativeEndian=False):
+    '''
+    Return a TAQTradesReader or TAQQuotesReader over the rows of the source
+    that the outlier file filePathName keeps; columns and nativeEndian are
+    passed to the source reader. Raises ValueError if the source changed
+    since the outlier file was written.
+    '''
+    outliers = readOutliers(filePathName)
+    if isStale(outliers):
+        raise ValueError('%s changed since %s was written; clean it again' % (outliers.source, filePathName))
+    if 'quote' in os.path.basename(outliers.source):
+        reader = TAQQuotesReader(outliers.source, nativeEndian=nativeEndian, columns=columns)
+    else:
+        reader = TAQTradesReader(outliers.source, nativeEndian=nativeEndian, columns=columns)
+    if reader.getN() != outliers.n:
+        raise ValueError('%s has %d rows, %s was written for %d'
+                         % (outliers.source, reader.getN(), filePathName, outliers.n))
+    return reader.filtered(keptMask(outliers))
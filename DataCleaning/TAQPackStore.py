@@ -0,0 +1,201 @@
+'''
+Per-date packed container for the TAQ data tree.
+
+The usual tree holds one gzip file per ticker per date per stage
+(trade_SP/<date>/<TICKER>_trades.binRT, ...), so a pass over a stage spends
+most of its time listing directories and opening and inflating small files.
+A pack replaces one <date> directory with a single uncompressed file
+<date>.taqpack:
+
+    header   magic, number of columns, number of tickers, index offset
+    blocks   for each ticker, its columns back to back as little-endian
+             4-byte values (the same columns, in the same order, as the
+             .binRT/.binRQ file), each block starting on a 64 byte boundary
+    index    one record per ticker: name, seconds from epoc to midnight,
+             N and the byte offset of its block
+
+TAQPackFile memory-maps a pack, so opening one ticker only touches the pages
+of that ticker's block, and hands the block to the usual TAQTradesReader or
+TAQQuotesReader. packDateDir and packTree convert the existing layout,
+unpackPack converts back.
+'''
+import os
+import struct
+import numpy as np
+from TAQTradesReader import TAQTradesReader
+from TAQQuotesReader import TAQQuotesReader
+from TAQColumnStream import decodeColumns, TRADE_COLUMNS, QUOTE_COLUMNS
+from TAQWriter import writeColumns, replaceFile
+
+PACK_SUFFIX = '.taqpack'
+TRADE_SUFFIX = '_trades.binRT'
+QUOTE_SUFFIX = '_quotes.binRQ'
+
+_MAGIC = b'TAQPK001'
+## magic, number of columns, number of tickers, index offset
+_HEADER = struct.Struct('<8siiq')
+_ALIGN = 64
+_INDEX_RECORD = np.dtype([('ticker', 'S16'), ('secs', '<i4'), ('n', '<i8'), ('offset', '<i8')])
+
+## per type: number of columns, on-disk dtypes of the source files, file suffix, reader
+_TYPES = {
+    'trade': (len(TRADE_COLUMNS), TRADE_COLUMNS, TRADE_SUFFIX, TAQTradesReader),
+    'quote': (len(QUOTE_COLUMNS), QUOTE_COLUMNS, QUOTE_SUFFIX, TAQQuotesReader),
+}
+
+
+class TAQPackFile(object):
+    '''
+    Read access to one pack. The whole file is memory-mapped once; getReader
+    returns a reader whose columns are views into the mapping, so nothing is
+    copied or decoded and the columns argument of the readers is moot.
+    '''
+
+    def __init__(self, packPathName):
+        self._packPathName = packPathName
+        with open(packPathName, 'rb') as f:
+            magic, ncols, ntickers, indexOffset = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC:
+                raise ValueError('%s is not a TAQ pack' % packPathName)
+            f.seek(indexOffset)
+            index = np.fromfile(f, dtype=_INDEX_RECORD, count=ntickers)
+        for type, (nColumns, _, _, _) in _TYPES.items():
+            if nColumns == ncols:
+                self.type = type
+        self._nColumns = ncols
+        self._index = dict((record['ticker'].decode('ascii'), record) for record in index)
+        self._data = np.memmap(packPathName, dtype='<u4', mode='r', shape=(indexOffset // 4,))
+
+    def getTickers(self):
+        return sorted(self._index)
+
+    def __contains__(self, ticker):
+        return ticker in self._index
+
+    def getN(self, ticker):
+        return int(self._record(ticker)['n'])
+
+    def _record(self, ticker):
+        try:
+            return self._index[ticker]
+        except KeyError:
+            raise KeyError('%s not in %s' % (ticker, self._packPathName))
+
+    def getColumns(self, ticker):
+        '''
+        Return (header, block) for ticker, where header is
+        (secsFromEpocToMidn, N) and block a read-only (nColumns, N)
+        little-endian uint32 view of the mapping.
+        '''
+        record = self._record(ticker)
+        n = int(record['n'])
+        start = int(record['offset']) // 4
+        block = self._data[start:start + self._nColumns * n].reshape(self._nColumns, n)
+        return (int(record['secs']), n), block
+
+    def getReader(self, ticker):
+        header, block = self.getColumns(ticker)
+        reader = _TYPES[self.type][3]
+        return reader._fromColumns('%s:%s' % (self._packPathName, ticker), header, block)
+
+
+def writePack(packPathName, type, entries):
+    '''
+    Write a pack of the given type ('trade' or 'quote') from entries, an
+    iterable of (ticker, header, block) with block a (nColumns, N) array of
+    the raw 4-byte values of each column, in any byte order. Entries are
+    written as they come, so only one ticker is held at a time. The pack
+    appears under its final name only once complete.
+    '''
+    nColumns = _TYPES[type][0]
+    packDir = os.path.dirname(os.path.abspath(packPathName))
+    if not os.path.exists(packDir):
+        os.makedirs(packDir)
+
+    def write(out):
+        out.write(b'\0' * _ALIGN)
+        records = []
+        for ticker, header, block in entries:
+            block = np.asarray(block)
+            if block.shape != (nColumns, header[1]):
+                raise ValueError('Block of %s has shape %s, expected %s'
+                                 % (ticker, block.shape, (nColumns, header[1])))
+            name = ticker.encode('ascii')
+            if len(name) > _INDEX_RECORD['ticker'].itemsize:
+                raise ValueError('Ticker name %s is too long' % ticker)
+            records.append((name, header[0], header[1], out.tell()))
+            out.write(np.ascontiguousarray(block, dtype='<u4'))
+            out.write(b'\0' * (-out.tell() % _ALIGN))
+        indexOffset = out.tell()
+        out.write(np.array(records, dtype=_INDEX_RECORD))
+        out.seek(0)
+        out.write(_HEADER.pack(_MAGIC, nColumns, len(records), indexOffset))
+    replaceFile(packPathName, write)
+
+def _sourceType(dateDir):
+    names = os.listdir(dateDir)
+    types = set()
+    for name in names:
+        for type, (_, _, suffix, _) in _TYPES.items():
+            if name.endswith(suffix):
+                types.add(type)
+    if len(types) != 1:
+        raise ValueError('Cannot tell trades from quotes in %s' % dateDir)
+    return types.pop()
+
+def packDateDir(dateDir, packPathName, type=None):
+    '''
+    Pack every <TICKER>_trades.binRT (or _quotes.binRQ) file of one date
+    directory into packPathName. type is guessed from the file names when
+    not given. Returns the number of tickers packed.
+    '''
+    if type is None:
+        type = _sourceType(dateDir)
+    nColumns, dtypes, suffix, _ = _TYPES[type]
+    names = sorted(name for name in os.listdir(dateDir) if name.endswith(suffix))
+
+    def entries():
+        for name in names:
+            header, block = decodeColumns(os.path.join(dateDir, name), dtypes, range(nColumns))
+            yield name[:-len(suffix)], header, block
+
+    writePack(packPathName, type, entries())
+    return len(names)
+
+def packTree(stageDir, packDir=None):
+    '''
+    Pack each <date> directory of a stage (e.g. Dataset/trade_SP_Adj) into
+    <packDir>/<date>.taqpack, by default in a sibling <stage>_packed
+    directory. Returns the list of packs written.
+    '''
+    stageDir = os.path.normpath(stageDir)
+    if packDir is None:
+        packDir = stageDir + '_packed'
+    packs = []
+    for date in sorted(os.listdir(stageDir)):
+        dateDir = os.path.join(stageDir, date)
+        if not os.path.isdir(dateDir):
+            continue
+        packPathName = os.path.join(packDir, date + PACK_SUFFIX)
+        packDateDir(dateDir, packPathName)
+        packs.append(packPathName)
+    return packs
+
+def unpackPack(packPathName, dateDir, codec=None):
+    '''
+    Write every ticker of a pack back out as a <TICKER>_trades.binRT (or
+    _quotes.binRQ) file in dateDir, through codec (see TAQWriter.TAQCodec).
+    '''
+    pack = TAQPackFile(packPathName)
+    _, dtypes, suffix, _ = _TYPES[pack.type]
+    if not os.path.exists(dateDir):
+        os.makedirs(dateDir)
+    for ticker in pack.getTickers():
+        (secs, n), block = pack.getColumns(ticker)
+        columns = [block[i].view('<' + dtype[1:]) for i, dtype in enumerate(dtypes)]
+        writeColumns(os.path.join(dateDir, ticker + suffix), secs, columns, dtypes, codec)
+
+if __name__ == '__main__':
+    workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/DataSet'
+    for stage in ['trade_SP_Adj', 'quote_SP_Adj']:
+        print(stage, len(packTree(os.path.join(workingDir, stage))), 'dates packed')
@@ -1,47 +1,180 @@
-import gzip
-import struct
+import numpy as np
+import TAQDecodeCache
+import TAQColumnCache
+from TAQWriter import writeColumns
+from TAQColumnStream import decodeColumns, toNative, peekFile, countRecords, TAQSlice, QUOTE_COLUMNS
 
 class TAQQuotesReader(object):
     '''
     This reader reads an entire compressed binary TAQ quotes file into memory,
     uncompresses it, and gives its clients access to the contents of the file
     via a set of get methods.
+
+    The columns are NumPy arrays, so no Python object is created per record.
+    The file is inflated chunk by chunk straight into those arrays (see
+    TAQColumnStream) and the raw uncompressed buffer is never held. By
+    default the arrays keep the big-endian byte order of the file; with
+    nativeEndian=True they are byteswapped in place.
+
+    Columns are decoded lazily, on first access, and a reader can be told
+    which columns it will need so that the others are never materialized.
+
+    When the decode cache is enabled (see TAQDecodeCache) the columns are
+    memory-mapped from an uncompressed sidecar instead of being inflated.
+    Otherwise, once the process-wide TAQColumnCache is turned on, decoded
+    columns are kept there, so readers of a file already read in this
+    process share its columns.
     '''
 
 
-    def __init__(self, filePathName ):
+    ## column names accepted by the columns argument, in file order
+    COLUMNS = ('millis', 'bidSize', 'bidPrice', 'askSize', 'askPrice')
+
+    def __init__(self, filePathName, nativeEndian=False, columns=None ):
+        '''
+        Read the header here; a column is only inflated the first time one of
+        its getters is called. columns names the columns the caller expects to
+        use (all of them by default): they are decoded together in one pass and
+        the others are skipped. A column outside that set is still available,
+        at the price of another pass over the file.
+        '''
+        self._filePathName = filePathName
+        self._nativeEndian = nativeEndian
+        if columns is None:
+            columns = self.COLUMNS
+        for name in columns:
+            if name not in self.COLUMNS:
+                raise ValueError('Unknown column %s' % name)
+        self._wanted = [ i for i, name in enumerate( self.COLUMNS ) if name in columns ]
+        self._columns = [ None ] * 5
+        ## the columns as Python lists, for the per-tick getters
+        self._lists = [ None ] * 5
+        ## for a filtered reader, the (reader, rows) its columns come from
+        self._source = None
+        cached = TAQDecodeCache.loadColumns( filePathName, 5 )
+        if cached is not None:
+            ## memory-mapped native-endian columns from the decode cache
+            self._header, body = cached
+            self._setColumns( body, range( 5 ) )
+            return
+        self._header = TAQColumnCache.readHeader( filePathName, QUOTE_COLUMNS )
+
+    @classmethod
+    def _fromColumns( cls, filePathName, header, body ):
         '''
-        Do all of the heavy lifting here and give users getters for the
-        results.
+        Build a reader over already decoded columns: a (5, N) uint32 block,
+        such as a memory-mapped ticker of a TAQPackStore pack, or a list of 5
+        uint32 columns, such as one day of a TAQTickerStore. Nothing is read
+        from filePathName, which only names the data.
         '''
+        self = cls.__new__( cls )
         self._filePathName = filePathName
-        with gzip.open( self._filePathName, 'rb') as f:
-            file_content = f.read()
-            self._header = struct.unpack_from(">2i",file_content[0:8])
-            
-            # millis from midnight
-            endI = 8 + ( 4 * self._header[1] )
-            self._ts = struct.unpack_from( ( ">%di" % self._header[ 1 ] ), file_content[ 8:endI ] )
-            startI = endI
-            
-            # bid size
-            endI = endI + ( 4 * self._header[1] )
-            self._bs = struct.unpack_from( ( ">%di" % self._header[ 1 ] ), file_content[ startI:endI ] )
-            startI = endI
-
-            # bid price
-            endI = endI + ( 4 * self._header[1] )
-            self._bp = struct.unpack_from( ( ">%df" % self._header[ 1 ] ), file_content[ startI:endI ] )
-            startI = endI
-            
-            # ask size
-            endI = endI + ( 4 * self._header[1] )
-            self._as = struct.unpack_from( ( ">%di" % self._header[ 1 ] ), file_content[ startI:endI ] )
-            startI = endI
-
-            # ask price
-            endI = endI + ( 4 * self._header[1] )
-            self._ap = struct.unpack_from( ( ">%df" % self._header[ 1 ] ), file_content[ startI:endI ] )
+        self._nativeEndian = all( column.dtype.isnative for column in body )
+        self._wanted = list( range( 5 ) )
+        self._columns = [ None ] * 5
+        ## the columns as Python lists, for the per-tick getters
+        self._lists = [ None ] * 5
+        ## for a filtered reader, the (reader, rows) its columns come from
+        self._source = None
+        self._header = tuple( header )
+        self._setColumns( body, range( 5 ) )
+        return self
+
+    def _load( self, index ):
+        if self._columns[ index ] is None:
+            self._decode( index )
+        return self._columns[ index ]
+
+    def _scalars( self, index ):
+        ## built on the first per-tick get; indexing a list is several times faster than
+        ## taking a scalar out of a NumPy array
+        if self._lists[ index ] is None:
+            self._lists[ index ] = self._load( index ).tolist()
+        return self._lists[ index ]
+
+    def _decode( self, index ):
+        if self._source is not None:
+            source, keep = self._source
+            column = source._load( index )[ keep ]
+            column.setflags( write=False )
+            self._columns[ index ] = column
+            return
+        if TAQDecodeCache.getDecodeCacheDir() is not None:
+            ## the sidecar needs every column
+            wanted = list( range( 5 ) )
+            self._header, body = decodeColumns( self._filePathName, QUOTE_COLUMNS, wanted )
+            body = toNative( body )
+            TAQDecodeCache.storeColumns( self._filePathName, self._header, body )
+            self._setColumns( body, wanted )
+            return
+        ## columns another reader of this file already decoded come from the column cache
+        wanted = sorted( set( [ i for i in self._wanted if self._columns[ i ] is None ] + [ index ] ) )
+        self._header, body = TAQColumnCache.decodeColumns( self._filePathName, QUOTE_COLUMNS, wanted, self._nativeEndian )
+        self._setColumns( body, wanted )
+
+    def _setColumns( self, body, indices ):
+        ## body is a 2-d uint32 block or a list of uint32 columns
+        for row, index in enumerate( indices ):
+            column = body[ row ].view( body[ row ].dtype.str[ 0 ] + QUOTE_COLUMNS[ index ][ 1: ] )
+            column.setflags( write=False )
+            self._columns[ index ] = column
+
+    def filtered( self, keep ):
+        '''
+        Return a reader over the rows of this one selected by keep, a boolean
+        mask or an array of row numbers, such as the rows an outlier file
+        keeps (see TAQOutliers). Its columns are taken from this reader on
+        first access, so only the columns actually used are decoded.
+        '''
+        keep = np.asarray( keep )
+        n = int( np.count_nonzero( keep ) ) if keep.dtype == bool else len( keep )
+        reader = self.__class__.__new__( self.__class__ )
+        reader._filePathName = self._filePathName
+        reader._nativeEndian = self._nativeEndian
+        reader._wanted = list( self._wanted )
+        reader._columns = [ None ] * 5
+        reader._lists = [ None ] * 5
+        reader._source = ( self, keep )
+        reader._header = ( self._header[ 0 ], n )
+        return reader
+
+    ## decoded on first access
+    _ts = property( lambda self: self._load( 0 ) )
+    _bs = property( lambda self: self._load( 1 ) )
+    _bp = property( lambda self: self._load( 2 ) )
+    _as = property( lambda self: self._load( 3 ) )
+    _ap = property( lambda self: self._load( 4 ) )
+
+    @staticmethod
+    def peek( filePathName, timeSpan=True ):
+        '''
+        Return TAQFileInfo(n, secsFromEpocToMidn, firstMillis, lastMillis)
+        without building a reader. Only the timestamp column is inflated, and
+        only when timeSpan is set.
+        '''
+        return peekFile( filePathName, QUOTE_COLUMNS, timeSpan )
+
+    @staticmethod
+    def peekN( filePathName ):
+        ## number of records from the gzip trailer, nothing is inflated
+        return countRecords( filePathName, QUOTE_COLUMNS )
+
+    def slice( self, startMillis=None, endMillis=None ):
+        '''
+        Return TAQSlice(start, stop, columns) for the ticks with
+        startMillis <= millis < endMillis; a bound left as None is open.
+        Timestamps are sorted, so the bounds come from a binary search, and
+        columns maps 'millis' and every column the reader was asked for to a
+        view of the window; nothing outside it is copied.
+        '''
+        ts = self.getMillisFromMidnArray()
+        start = 0 if startMillis is None else int( np.searchsorted( ts, startMillis, 'left' ) )
+        stop = len( ts ) if endMillis is None else int( np.searchsorted( ts, endMillis, 'left' ) )
+        stop = max( start, stop )
+        columns = {}
+        for index in sorted( set( self._wanted + [ 0 ] ) ):
+            columns[ self.COLUMNS[ index ] ] = self._load( index )[ start:stop ]
+        return TAQSlice( start, stop, columns )
 
     def getN(self):
         return self._header[1]
@@ -49,49 +182,63 @@ class TAQQuotesReader(object):
     def getSecsFromEpocToMidn(self):
         return self._header[0]
     
+    ## per-tick getters index a list of the column (see _scalars), they are called in loops
     def getMillisFromMidn( self, index ):
-        return self._ts[ index ]
+        values = self._lists[ 0 ]
+        if values is None:
+            values = self._scalars( 0 )
+        return values[ index ]
 
     def getAskSize( self, index ):
-        return self._as[ index ]
+        values = self._lists[ 3 ]
+        if values is None:
+            values = self._scalars( 3 )
+        return values[ index ]
     
     def getAskPrice( self, index ):
-        return self._ap[ index ]
+        values = self._lists[ 4 ]
+        if values is None:
+            values = self._scalars( 4 )
+        return values[ index ]
 
     def getBidSize( self, index ):
-        return self._bs[ index ]
+        values = self._lists[ 1 ]
+        if values is None:
+            values = self._scalars( 1 )
+        return values[ index ]
     
     def getBidPrice( self, index ):
-        return self._bp[ index ]
-
-    def rewriteCleaned( self, ts, bidSize, bidPrice, askSize, askPrice, filePathName):
-        out = gzip.open( filePathName, "wb" )
-        out.write(struct.pack(">2i",self.getSecsFromEpocToMidn(), len(ts)))
-        out.write(struct.pack(">%di" % len(ts), *ts))
-        out.write(struct.pack(">%di" % len(bidSize), *bidSize))
-        out.write(struct.pack(">%df" % len(bidPrice), *bidPrice))
-        out.write(struct.pack(">%di" % len(askSize), *askSize))
-        out.write(struct.pack(">%df" % len(askPrice), *askPrice))
-        out.close()
+        values = self._lists[ 2 ]
+        if values is None:
+            values = self._scalars( 2 )
+        return values[ index ]
+
+    ## whole-column getters, read-only arrays of length getN()
+    def getMillisFromMidnArray( self ):
+        return self._ts
+
+    def getAskSizeArray( self ):
+        return self._as
+
+    def getAskPriceArray( self ):
+        return self._ap
+
+    def getBidSizeArray( self ):
+        return self._bs
+
+    def getBidPriceArray( self ):
+        return self._bp
+
+    ## codec is a TAQWriter.TAQCodec or a string such as 'gzip:1'; gzip level 9 by default
+    def rewriteCleaned( self, ts, bidSize, bidPrice, askSize, askPrice, filePathName, codec=None):
+        writeColumns( filePathName, self.getSecsFromEpocToMidn(),
+                      [ ts, bidSize, bidPrice, askSize, askPrice ], QUOTE_COLUMNS, codec )
         
-    def rewrite_adj(self, filePathName, adj_s, adj_p):
-        out = gzip.open(filePathName, "wb")
-        header = [self.getSecsFromEpocToMidn(), self.getN()]
-        out.write(struct.pack(">2i", *header))
-        ts_list = []
-        bs_list = []
-        bp_list = []
-        as_list = []
-        ap_list = []
-        for i in range(self.getN()):
-            ts_list.append(self.getMillisFromMidn(i))
-            bs_list.append(int(self.getBidSize(i) * adj_s))
-            bp_list.append(self.getBidPrice(i) / adj_p)
-            as_list.append(int(self.getAskSize(i) * adj_s))
-            ap_list.append(self.getAskPrice(i) / adj_p)
-        out.write(struct.pack(">%di" % header[1], *ts_list))
-        out.write(struct.pack(">%di" % header[1], *bs_list))
-        out.write(struct.pack(">%df" % header[1], *bp_list))
-        out.write(struct.pack(">%di" % header[1], *as_list))
-        out.write(struct.pack(">%df" % header[1], *ap_list))
-        out.close()
\ No newline at end of file
+    def rewrite_adj(self, filePathName, adj_s, adj_p, codec=None):
+        ## same arithmetic as int(size * adj_s) and price / adj_p in double precision
+        writeColumns( filePathName, self.getSecsFromEpocToMidn(),
+                      [ self.getMillisFromMidnArray(),
+                        self.getBidSizeArray() * adj_s,
+                        self.getBidPriceArray().astype( np.float64 ) / adj_p,
+                        self.getAskSizeArray() * adj_s,
+                        self.getAskPriceArray().astype( np.float64 ) / adj_p ], QUOTE_COLUMNS, codec )
\ No newline at end of file
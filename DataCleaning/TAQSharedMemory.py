@@ -0,0 +1,74 @@
+'''
+Hand pool results from workers to the parent through shared memory.
+
+A worker that returns a DataFrame through multiprocessing.Pool pickles it,
+Timestamp index and all, and pushes the bytes through a pipe, which for a
+few hundred tickers costs more than computing the result. Instead, a worker
+calls exportFrame to copy its frame into a new multiprocessing.shared_memory
+block and returns the small TAQSharedFrame descriptor. The parent passes it
+to importFrame and gets back a DataFrame whose index and columns are views
+of that block: nothing is pickled or copied on the way.
+
+A frame has a DatetimeIndex and float64 columns, the shape of the resampled
+returns in TAQSummary. The block holds one row of int64 nanoseconds for the
+index and one row per column. importFrame unlinks the block, so its memory
+goes back to the system once the last array over it is gone. Call
+startTracker in the parent before creating the pool, so the workers
+register their blocks with the parent's resource tracker and a block whose
+descriptor never made it back is still cleaned up at exit.
+'''
+import os
+from multiprocessing import shared_memory
+import collections
+import numpy as np
+import pandas as pd
+
+## what a worker returns in place of its DataFrame
+TAQSharedFrame = collections.namedtuple('TAQSharedFrame', ['name', 'n', 'columns', 'indexName'])
+
+
+class _AttachedBlock(shared_memory.SharedMemory):
+    ## the parent's arrays keep the mapping alive through shm.buf; the
+    ## mapping is released with the last of them, not with this handle
+    def __del__(self):
+        pass
+
+
+def startTracker():
+    ## POSIX only; on Windows a block lives as long as its handles
+    if os.name == 'posix':
+        from multiprocessing import resource_tracker
+        resource_tracker.ensure_running()
+
+def exportFrame(df):
+    '''
+    Copy df into a new shared memory block and return its TAQSharedFrame.
+    The block is left for the parent to import and unlink.
+    '''
+    n = len(df)
+    columns = list(df.columns)
+    shape = (len(columns) + 1, n)
+    ## a block cannot be empty
+    shm = shared_memory.SharedMemory(create=True, size=max(8 * shape[0] * shape[1], 1))
+    try:
+        block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        block[0].view(np.int64)[:] = df.index.asi8
+        for row, column in enumerate(columns):
+            block[row + 1] = df[column].to_numpy(dtype=np.float64)
+        del block
+    finally:
+        shm.close()
+    return TAQSharedFrame(shm.name, n, columns, df.index.name)
+
+def importFrame(descriptor):
+    '''
+    Return the DataFrame of a TAQSharedFrame, as views of its shared memory
+    block, and unlink the block.
+    '''
+    shm = _AttachedBlock(descriptor.name)
+    try:
+        block = np.ndarray((len(descriptor.columns) + 1, descriptor.n), dtype=np.float64, buffer=shm.buf)
+    finally:
+        shm.unlink()
+    index = pd.DatetimeIndex(block[0].view('M8[ns]'), name=descriptor.indexName, copy=False)
+    return pd.DataFrame(block[1:].T, index=index, columns=descriptor.columns, copy=False)
@@ -2,34 +2,53 @@ import pandas as pd
 import numpy as np
 from TAQTradesReader import TAQTradesReader as tr
 from TAQQuotesReader import TAQQuotesReader as qr
+from TAQTime import millisToDatetimeIndex
+from TAQTickerStore import TAQTickerStore
+from TAQSharedMemory import exportFrame, importFrame, startTracker
+from TAQOutliers import outliersPath, isOutliersPath, openOutliers, readOutliers, countKept
 import os
 import sys
 import platform
-import datetime
 
 from tqdm import tqdm
 import multiprocessing as mp
 
 
 class TAQSummary(object):
-    def __init__(self,Ticker,workdingDir, freq = 10):
+    ## sessionWindow = (startMillis, endMillis), e.g. (34200000, 57600000) for 9:30-16:00,
+    ## restricts every statistic to the ticks of that window
+    ## storeDir, if given, is the root of the ticker stores built by TAQTickerStore.buildTickerStores;
+    ## the history is then read from <storeDir>/<stage>/<Ticker> instead of one file per date
+    def __init__(self,Ticker,workdingDir, freq = 10, sessionWindow = None, storeDir = None):
         self.X = freq
+        self.sessionWindow = sessionWindow
+        self.storeDir = storeDir
         self.Ticker = Ticker
         self.workingDir = workdingDir
 
+    ## name of the stage directory holding the given type of data
+    @staticmethod
+    def stageName(type, ifCleaned = False, K=None, gamma_multiplier = None):
+        if not ifCleaned:
+            return type + '_SP_Adj'
+        if K is None and gamma_multiplier is None:
+            return type + '_SP_Adj_cleaned'
+        return type + '_SP_Adj_cleaned_' +str(K)+'_'+str(gamma_multiplier).replace('.','_')
+
+    ## path of the data of one date in stageDir: the file itself or, for a tree cleaned
+    ## with outliersOnly, the outlier file standing in for it; None if neither exists
+    @staticmethod
+    def datePath(stageDir, date, fileName):
+        filePathName = os.path.join(stageDir, date, fileName)
+        if os.path.exists(filePathName):
+            return filePathName
+        if os.path.exists(outliersPath(filePathName)):
+            return outliersPath(filePathName)
+        return None
+
     ## load trades data file paths of the given tickers
     def loadTradeData(self, ifCleaned = False, K=None, gamma_multiplier =None):
-        if K is None and gamma_multiplier is None:
-            if ifCleaned:
-                dir_suffix = 'trade_SP_Adj_cleaned'
-            else:
-                dir_suffix = 'trade_SP_Adj'
-        else:
-            if ifCleaned:
-                dir_suffix = 'trade_SP_Adj_cleaned_' +str(K)+'_'+str(gamma_multiplier).replace('.','_') 
-            else:
-                dir_suffix = 'trade_SP_Adj'
-        
+        dir_suffix = self.stageName('trade', ifCleaned, K, gamma_multiplier)
         self.tradeDir = self.workingDir+dir_suffix
      
         dateList = [i for i in os.listdir(self.tradeDir) if os.path.isdir(os.path.join(self.tradeDir,i))]
@@ -37,66 +56,65 @@ class TAQSummary(object):
 
         self.tradeFileList = []
         for _date in dateList:
-            _tempDir = os.path.join(self.tradeDir, _date, self.Ticker + '_trades.binRT')
-            if os.path.exists(_tempDir):
+            _tempDir = self.datePath(self.tradeDir, _date, self.Ticker + '_trades.binRT')
+            if _tempDir is not None:
                 self.tradeFileList.append(_tempDir)
 
     ## load quotes data file paths of the given tickers
     def loadQuoteData(self, ifCleaned = False,K=None, gamma_multiplier = None):
-        if K is None and gamma_multiplier is None:
-            if ifCleaned:
-                dir_suffix = 'quote_SP_Adj_cleaned'
-            else:
-                dir_suffix = 'quote_SP_Adj'
-        else:
-            if ifCleaned:
-                dir_suffix = 'quote_SP_Adj_cleaned_' +str(K)+'_'+str(gamma_multiplier).replace('.','_') 
-            else:
-                dir_suffix = 'quote_SP_Adj'
+        dir_suffix = self.stageName('quote', ifCleaned, K, gamma_multiplier)
         self.quoteDir = self.workingDir+dir_suffix
         dateList = [i for i in os.listdir(self.quoteDir) if os.path.isdir(os.path.join(self.quoteDir,i))]
         dateList.sort()
 
         self.quoteFileList = []
         for _date in dateList:
-            _tempDir = os.path.join(self.quoteDir, _date, self.Ticker + '_quotes.binRQ')
-            if os.path.exists(_tempDir):
+            _tempDir = self.datePath(self.quoteDir, _date, self.Ticker + '_quotes.binRQ')
+            if _tempDir is not None:
                 self.quoteFileList.append(_tempDir)
     
+    ## open the ticker store of the given type
+    def loadStore(self, type, ifCleaned = False, K=None, gamma_multiplier = None):
+        return TAQTickerStore(os.path.join(self.storeDir,
+                                           self.stageName(type, ifCleaned, K, gamma_multiplier),
+                                           self.Ticker), type)
+
     ## compute the returns of given ticker for given file path
     def computeStatWithFreq(self, filePathName, type='trade'):
-
-        X = self.X
         ## given a filePathName read the data
         ## then calcualte return
+        ## only timestamps and prices are used, sizes are never decoded
         if type == 'trade':
-            dataReader = tr(filePathName)
+            columns = ('millis', 'price')
         else:
-            dataReader = qr(filePathName)
-        ## Time
-        _tsYearMonthDate = datetime.datetime.fromtimestamp(
-                dataReader.getSecsFromEpocToMidn()
-        )
-        _tsList = []
-        for i in range(dataReader.getN()):
-            _tsList.append(
-                ## Y-M-D + m-s
-                pd.Timestamp(_tsYearMonthDate+\
-                    datetime.timedelta(milliseconds = 
-                        dataReader.getMillisFromMidn(i)))
-            )
-        ## Prices
-        _prices = []
+            columns = ('millis', 'bidPrice', 'askPrice')
+        if isOutliersPath(filePathName):
+            dataReader = openOutliers(filePathName, columns=columns)
+        elif type == 'trade':
+            dataReader = tr(filePathName, columns=columns)
+        else:
+            dataReader = qr(filePathName, columns=columns)
+        return self.computeStatWithReader(dataReader, type)
+
+    ## compute the returns of given ticker for one date, from an open reader
+    def computeStatWithReader(self, dataReader, type='trade'):
+        X = self.X
+        ## index bounds of the ticks in the session window
+        if self.sessionWindow is None:
+            start, stop = 0, dataReader.getN()
+        else:
+            window = dataReader.slice(*self.sessionWindow)
+            start, stop = window.start, window.stop
+        ## Time, Y-M-D + m-s
+        _tsList = millisToDatetimeIndex(dataReader.getSecsFromEpocToMidn(),
+                                        dataReader.getMillisFromMidnArray()[start:stop])
+        ## Prices, in double precision as the getters return them
         if type == 'trade':
-            for i in range(dataReader.getN()):
-                ## add trade price
-                _prices.append(dataReader.getPrice(i)) 
+            _prices = dataReader.getPriceArray()[start:stop].astype(np.float64)
         else:
-            for i in range(dataReader.getN()):
-                ## add mid price
-                _midPrice = 1/2 * (dataReader.getAskPrice(i) +\
-                            dataReader.getBidPrice(i))
-                _prices.append(_midPrice) 
+            ## mid price
+            _prices = 1/2 * (dataReader.getAskPriceArray()[start:stop].astype(np.float64) +\
+                        dataReader.getBidPriceArray()[start:stop].astype(np.float64))
         ## Time-Price DataFrame
         _df = pd.DataFrame({'Prices':_prices,'Time':_tsList}).set_index('Time')
    
@@ -105,12 +123,17 @@ class TAQSummary(object):
         #_returns = _dfResampled['Prices'].dropna().to_list()
 
         ## return the resampled returns in a list, also the number of trades/quotes with date
-        return _dfResampled, dataReader.getN()
+        return _dfResampled, stop - start
 
     ## compute summary statistics based on returns calcualted from each individual Ticker,
     ## on individual dates
-    def computeStatForAllDatesWithFreq(self, ifCleaned = False, K=None, gamma_multiplier = None, progress_bar = True):
+    ## with sharedMemory, the workers hand their returns back through shared memory blocks
+    ## (see TAQSharedMemory) instead of pickling DataFrames through the pool's pipe
+    def computeStatForAllDatesWithFreq(self, ifCleaned = False, K=None, gamma_multiplier = None, progress_bar = True,
+                                       sharedMemory = False):
         X = self.X
+        if self.storeDir is not None:
+            return self.computeStatFromStore(ifCleaned=ifCleaned, K=K, gamma_multiplier=gamma_multiplier)
         ## compute returns of given ticker with all other statistics
         ## calculate the how period, ignoring the timestamp
         self.loadQuoteData(ifCleaned=ifCleaned, K=K, gamma_multiplier = gamma_multiplier)
@@ -119,6 +142,14 @@ class TAQSummary(object):
         self.trade_nums = 0 
         self.quote_returns = []
         self.quote_nums = 0
+        ## tasks are module level functions, so self is not pickled with every task
+        if sharedMemory:
+            task = _computeStatShared
+            receive = importFrame
+            startTracker()
+        else:
+            task = _computeStat
+            receive = lambda x: x
         if progress_bar:
             pbarTrade = tqdm(total=len(self.tradeFileList))
             pbarTrade.set_description('processing trade stat')
@@ -126,49 +157,76 @@ class TAQSummary(object):
             pbarQuote.set_description('processing quote stat')
 
             def updateTrade(x):
-                self.trade_returns.append(x[0])
+                self.trade_returns.append(receive(x[0]))
                 self.trade_nums += x[1]
                 pbarTrade.update()
 
             def updateQuote(x):
-                self.quote_returns.append(x[0])
+                self.quote_returns.append(receive(x[0]))
                 self.quote_nums += x[1]
                 pbarQuote.update()
-
-            n_core = 10
-            pool1 = mp.Pool(n_core)
-            pool2 = mp.Pool(n_core)
-            
-            for _param1, _param2 in zip(self.tradeFileList, self.quoteFileList):
-                pool1.apply_async(self.computeStatWithFreq,
-                                args=(_param1,'trade'),callback=updateTrade)
-                pool2.apply_async(self.computeStatWithFreq,
-                                args=(_param2,'quote'),callback=updateQuote)
-            pool1.close()
-            pool1.join()
-            pool2.close()
-            pool2.join()
         else:
             def updateTrade(x):
-                self.trade_returns.append(x[0])
+                self.trade_returns.append(receive(x[0]))
                 self.trade_nums += x[1]
 
             def updateQuote(x):
-                self.quote_returns.append(x[0])
+                self.quote_returns.append(receive(x[0]))
                 self.quote_nums += x[1]
 
-            n_core = 10
-            pool1 = mp.Pool(n_core)
-            pool2 = mp.Pool(n_core)
-            for _param1, _param2 in zip(self.tradeFileList, self.quoteFileList):
-                pool1.apply_async(self.computeStatWithFreq,
-                                args=(_param1,'trade'), callback=updateTrade)
-                pool2.apply_async(self.computeStatWithFreq,
-                                args=(_param2,'quote'),callback=updateQuote)
-            pool1.close()
-            pool1.join()
-            pool2.close()
-            pool2.join()
+        ## one pool sized to the machine for every file; trade and quote dates need not pair up
+        pool = mp.Pool(os.cpu_count())
+        for _param in self.tradeFileList:
+            pool.apply_async(task,
+                            args=(_param,'trade',X,self.sessionWindow), callback=updateTrade)
+        for _param in self.quoteFileList:
+            pool.apply_async(task,
+                            args=(_param,'quote',X,self.sessionWindow),callback=updateQuote)
+        pool.close()
+        pool.join()
+
+    ## same as computeStatForAllDatesWithFreq, reading the ticker stores day by day;
+    ## the whole history of a column is one memory-mapped file, so no pool is needed
+    def computeStatFromStore(self, ifCleaned = False, K=None, gamma_multiplier = None):
+        tradeStore = self.loadStore('trade', ifCleaned, K, gamma_multiplier)
+        quoteStore = self.loadStore('quote', ifCleaned, K, gamma_multiplier)
+        ## the dates stand in for the file lists in computeSummary
+        self.tradeFileList = tradeStore.getDates()
+        self.quoteFileList = quoteStore.getDates()
+        self.trade_returns = []
+        self.trade_nums = 0
+        self.quote_returns = []
+        self.quote_nums = 0
+        for _date, _reader in tradeStore.iterReaders():
+            _returns, _nums = self.computeStatWithReader(_reader, 'trade')
+            self.trade_returns.append(_returns)
+            self.trade_nums += _nums
+        for _date, _reader in quoteStore.iterReaders():
+            _returns, _nums = self.computeStatWithReader(_reader, 'quote')
+            self.quote_returns.append(_returns)
+            self.quote_nums += _nums
+
+    ## count the trades and quotes of the given ticker from the gzip trailers (or the
+    ## headers of outlier files) alone,
+    ## without decoding any file; sets trade_nums and quote_nums like
+    ## computeStatForAllDatesWithFreq does and returns them with their ratio.
+    ## With a session window only the ticks in it count, and the timestamps are decoded
+    def computeTickCounts(self, ifCleaned = False, K=None, gamma_multiplier = None):
+        if self.storeDir is not None:
+            counts = []
+            for type in ['trade', 'quote']:
+                store = self.loadStore(type, ifCleaned, K, gamma_multiplier)
+                if self.sessionWindow is None:
+                    counts.append(store.getN())
+                else:
+                    counts.append(sum([_windowN(reader, self.sessionWindow) for _, reader in store.iterReaders()]))
+            self.trade_nums, self.quote_nums = counts
+            return self.trade_nums, self.quote_nums, self.trade_nums / self.quote_nums
+        self.loadQuoteData(ifCleaned=ifCleaned, K=K, gamma_multiplier = gamma_multiplier)
+        self.loadTradeData(ifCleaned=ifCleaned, K=K, gamma_multiplier = gamma_multiplier)
+        self.trade_nums = sum([_peekN(i, tr, self.sessionWindow) for i in self.tradeFileList])
+        self.quote_nums = sum([_peekN(i, qr, self.sessionWindow) for i in self.quoteFileList])
+        return self.trade_nums, self.quote_nums, self.trade_nums / self.quote_nums
 
     ## summary all the data computed so far
     def computeSummary(self):
@@ -223,6 +281,32 @@ class TAQSummary(object):
 
         return tradesStat, quotesStat
 
+## number of ticks of a data file or outlier file; with a sessionWindow, of the ticks in
+## it, which decodes the timestamps only
+def _peekN(filePathName, reader, sessionWindow=None):
+    if sessionWindow is None:
+        if isOutliersPath(filePathName):
+            return countKept(readOutliers(filePathName))
+        return reader.peekN(filePathName)
+    if isOutliersPath(filePathName):
+        dataReader = openOutliers(filePathName, columns=('millis',))
+    else:
+        dataReader = reader(filePathName, columns=('millis',))
+    return _windowN(dataReader, sessionWindow)
+
+## number of ticks of an open reader in sessionWindow
+def _windowN(dataReader, sessionWindow):
+    window = dataReader.slice(*sessionWindow)
+    return window.stop - window.start
+
+## pool tasks of computeStatForAllDatesWithFreq
+def _computeStat(filePathName, type, freq, sessionWindow):
+    return TAQSummary(None, None, freq=freq, sessionWindow=sessionWindow).computeStatWithFreq(filePathName, type)
+
+def _computeStatShared(filePathName, type, freq, sessionWindow):
+    _dfResampled, _nums = _computeStat(filePathName, type, freq, sessionWindow)
+    return exportFrame(_dfResampled), _nums
+
 if __name__ == '__main__':
     workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/DataSet/'
     Ticker = 'AAPL'
@@ -0,0 +1,222 @@
+'''
+Per-ticker, multi-day, append-only store for the TAQ data tree.
+
+TAQSummary and covEstimator read one ticker over every date, which in the
+usual tree means opening and inflating one small gzip file per date. A
+ticker store keeps the whole history of one ticker of one stage in a
+directory <storeDir>/<stage>/<TICKER>:
+
+    <column>.col   one file per column (millis, size, price for trades,
+                   millis, bidSize, bidPrice, askSize, askPrice for quotes),
+                   the days back to back as uncompressed little-endian
+                   4-byte values
+    index          one record per day: date, seconds from epoc to midnight,
+                   first row, N, and the size and mtime of the file the day
+                   was read from
+
+New dates are appended at the end. The index record is written last, so a
+day whose append was interrupted is simply not there, and its partial
+column data is cut off by the next append. A day can only be replaced by
+truncating the store back to it and appending again from there, which is
+what buildTickerStores does for a backfilled date or a re-adjusted day.
+Columns are returned as memory-mapped arrays over the whole history, so a
+scan of one ticker is one sequential read per column.
+'''
+import os
+import numpy as np
+from TAQTradesReader import TAQTradesReader
+from TAQQuotesReader import TAQQuotesReader
+from TAQColumnStream import decodeColumns, TRADE_COLUMNS, QUOTE_COLUMNS
+from TAQPackStore import TRADE_SUFFIX, QUOTE_SUFFIX
+from TAQOutliers import OUTLIER_SUFFIX, openOutliers
+
+_INDEX_RECORD = np.dtype([('date', 'S8'), ('secs', '<i4'), ('start', '<i8'), ('n', '<i8'),
+                          ('size', '<i8'), ('mtime', '<i8')])
+
+## per type: on-disk dtypes of the source files, file suffix, reader
+_TYPES = {
+    'trade': (TRADE_COLUMNS, TRADE_SUFFIX, TAQTradesReader),
+    'quote': (QUOTE_COLUMNS, QUOTE_SUFFIX, TAQQuotesReader),
+}
+
+
+class TAQTickerStore(object):
+    '''
+    One ticker's history of one type ('trade' or 'quote') in storeDir,
+    created empty if needed.
+    '''
+
+    def __init__(self, storeDir, type):
+        if type not in _TYPES:
+            raise ValueError('Data type is invalid')
+        self._storeDir = storeDir
+        self.type = type
+        self._dtypes, _, self._reader = _TYPES[type]
+        self._names = self._reader.COLUMNS
+        if not os.path.exists(storeDir):
+            os.makedirs(storeDir)
+        self._readIndex()
+
+    def _readIndex(self):
+        path = os.path.join(self._storeDir, 'index')
+        if os.path.exists(path):
+            ## a record cut short by an interrupted append is ignored
+            count = os.path.getsize(path) // _INDEX_RECORD.itemsize
+            self._index = np.fromfile(path, dtype=_INDEX_RECORD, count=count)
+        else:
+            self._index = np.zeros(0, dtype=_INDEX_RECORD)
+        self._maps = {}
+
+    def getDates(self):
+        return [date.decode('ascii') for date in self._index['date']]
+
+    def getN(self):
+        if len(self._index) == 0:
+            return 0
+        return int(self._index['start'][-1] + self._index['n'][-1])
+
+    def getIndex(self):
+        '''
+        The day index as a structured array with fields date, secs (seconds
+        from epoc to midnight), start (first row of the day), n, and size and
+        mtime (st_mtime_ns) of the source of the day.
+        '''
+        return self._index
+
+    def getColumn(self, name):
+        '''
+        Return the named column over every day as a read-only memory-mapped
+        array, in native values (int32 or float32).
+        '''
+        if name not in self._names:
+            raise ValueError('Unknown column %s' % name)
+        if name not in self._maps:
+            n = self.getN()
+            dtype = '<' + self._dtypes[self._names.index(name)][1:]
+            if n == 0:
+                self._maps[name] = np.zeros(0, dtype=dtype)
+            else:
+                self._maps[name] = np.memmap(self._columnPath(name), dtype=dtype, mode='r', shape=(n,))
+        return self._maps[name]
+
+    def getReader(self, date):
+        '''
+        Return a TAQTradesReader or TAQQuotesReader for one stored date, over
+        views of the memory-mapped columns.
+        '''
+        row = np.flatnonzero(self._index['date'] == date.encode('ascii'))
+        if len(row) == 0:
+            raise KeyError('%s not in %s' % (date, self._storeDir))
+        record = self._index[row[0]]
+        start, n = int(record['start']), int(record['n'])
+        body = [self.getColumn(name)[start:start + n].view('<u4') for name in self._names]
+        return self._reader._fromColumns('%s:%s' % (self._storeDir, date), (int(record['secs']), n), body)
+
+    def iterReaders(self):
+        for date in self.getDates():
+            yield date, self.getReader(date)
+
+    def append(self, date, header, block, source=(0, 0)):
+        '''
+        Append one day: header is (secsFromEpocToMidn, N) and block the
+        N raw 4-byte values of each column, in any byte order; source is the
+        (size, mtime_ns) of the file the day was read from. Dates must come in
+        increasing order.
+        '''
+        dates = self.getDates()
+        if dates and date <= dates[-1]:
+            raise ValueError('Cannot append %s after %s in %s' % (date, dates[-1], self._storeDir))
+        if len(block) != len(self._names):
+            raise ValueError('Expected %d columns, got %d' % (len(self._names), len(block)))
+        start = self.getN()
+        for name, column in zip(self._names, block):
+            if len(column) != header[1]:
+                raise ValueError('Column %s of %s has %d rows, expected %d'
+                                 % (name, date, len(column), header[1]))
+            with open(self._columnPath(name), 'ab') as out:
+                ## drop whatever an interrupted append left behind
+                out.truncate(4 * start)
+                out.write(np.ascontiguousarray(column, dtype='<u4'))
+        record = np.array([(date.encode('ascii'), header[0], start, header[1]) + tuple(source)],
+                          dtype=_INDEX_RECORD)
+        indexPath = os.path.join(self._storeDir, 'index')
+        with open(indexPath, 'ab') as out:
+            out.truncate(len(self._index) * _INDEX_RECORD.itemsize)
+            out.write(record)
+        self._readIndex()
+
+    def truncate(self, date):
+        '''
+        Drop date and every later day, so they can be appended again; their
+        column data is cut off by the next append.
+        '''
+        keep = int(np.count_nonzero(self._index['date'] < date.encode('ascii')))
+        if keep == len(self._index):
+            return
+        with open(os.path.join(self._storeDir, 'index'), 'r+b') as out:
+            out.truncate(keep * _INDEX_RECORD.itemsize)
+        self._readIndex()
+
+    def _columnPath(self, name):
+        return os.path.join(self._storeDir, name + '.col')
+
+
+def _readDay(filePathName, dtypes, outliers):
+    ## header and raw columns of one day file, or of the rows an outlier file keeps
+    if not outliers:
+        return decodeColumns(filePathName, dtypes, range(len(dtypes)))
+    reader = openOutliers(filePathName)
+    columns = reader.slice().columns
+    block = [columns[name].view(columns[name].dtype.str[0] + 'u4') for name in reader.COLUMNS]
+    return (reader.getSecsFromEpocToMidn(), reader.getN()), block
+
+def buildTickerStores(stageDir, storeDir, tickers=None):
+    '''
+    Append every date of a stage directory (e.g. Dataset/quote_SP_Adj) to the
+    ticker stores under <storeDir>/<stage>, for all tickers or only those in
+    tickers. In a stage of outlier files (see TAQOutliers) the kept rows of
+    their sources are stored. Dates a store already holds from a file of the
+    same size and mtime are skipped, so running it again after new dates
+    arrive only appends those; a store is truncated back to a day whose file
+    changed (e.g. re-adjusted) or to a backfilled date before its last one,
+    and the days from there are appended again. Returns the number of days
+    appended.
+    '''
+    stageDir = os.path.normpath(stageDir)
+    stageStoreDir = os.path.join(storeDir, os.path.basename(stageDir))
+    stores = {}
+    appended = 0
+    for date in sorted(os.listdir(stageDir)):
+        dateDir = os.path.join(stageDir, date)
+        if not os.path.isdir(dateDir):
+            continue
+        for name in sorted(os.listdir(dateDir)):
+            for type, (dtypes, suffix, _) in _TYPES.items():
+                outliers = name.endswith(suffix + OUTLIER_SUFFIX)
+                if not outliers and not name.endswith(suffix):
+                    continue
+                ticker = name[:-len(suffix + OUTLIER_SUFFIX if outliers else suffix)]
+                if tickers is not None and ticker not in tickers:
+                    continue
+                if ticker not in stores:
+                    stores[ticker] = TAQTickerStore(os.path.join(stageStoreDir, ticker), type)
+                store = stores[ticker]
+                filePathName = os.path.join(dateDir, name)
+                stat = os.stat(filePathName)
+                source = (stat.st_size, stat.st_mtime_ns)
+                index = store.getIndex()
+                stored = np.flatnonzero(index['date'] == date.encode('ascii'))
+                if len(stored) and (index['size'][stored[0]], index['mtime'][stored[0]]) == source:
+                    continue
+                if len(index) and date.encode('ascii') <= index['date'][-1]:
+                    store.truncate(date)
+                header, block = _readDay(filePathName, dtypes, outliers)
+                store.append(date, header, block, source)
+                appended += 1
+    return appended
+
+if __name__ == '__main__':
+    workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/DataSet'
+    for stage in ['trade_SP_Adj_cleaned', 'quote_SP_Adj_cleaned']:
+        print(stage, buildTickerStores(os.path.join(workingDir, stage), os.path.join(workingDir, 'store')),
+              'days appended')
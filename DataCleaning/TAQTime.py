@@ -0,0 +1,26 @@
+'''
+Timestamps of TAQ ticks.
+
+A TAQ file stores the seconds from epoc to midnight of its date once, in the
+header, and every tick as milliseconds from midnight. The analysis code used
+to build one pd.Timestamp per tick as
+datetime.datetime.fromtimestamp(secs) + datetime.timedelta(milliseconds=ms);
+millisToDatetimeIndex gives the same timestamps for a whole column in one
+array operation.
+'''
+import datetime
+import numpy as np
+import pandas as pd
+
+
+def millisToDatetime64(secsFromEpocToMidn, millis):
+    '''
+    Return the datetime64[ms] array of the ticks at millis (milliseconds
+    from midnight) on the date whose midnight is secsFromEpocToMidn. The
+    date is taken in local time, like datetime.datetime.fromtimestamp.
+    '''
+    midnight = np.datetime64(datetime.datetime.fromtimestamp(secsFromEpocToMidn), 'ms')
+    return midnight + np.asarray(millis).astype('timedelta64[ms]')
+
+def millisToDatetimeIndex(secsFromEpocToMidn, millis, name=None):
+    return pd.DatetimeIndex(millisToDatetime64(secsFromEpocToMidn, millis), name=name)
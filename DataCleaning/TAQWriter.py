@@ -0,0 +1,214 @@
+'''
+Writers for the column-major TAQ binary layout read by TAQTradesReader and
+TAQQuotesReader: an 8 byte big-endian header (seconds from epoc to midnight,
+N) followed by each column as N big-endian 4-byte values. Every column is
+converted with one array operation and handed to the compressor in a single
+write, instead of being packed value by value.
+
+Where the bytes go is decided by a TAQCodec: gzip at a chosen level (level 9,
+the historical default, is the slowest), gzip compressed on a thread pool
+(pgzip, see ParallelGzipWriter), raw uncompressed, or lzma/bz2 for archives.
+The readers recognise every codec from the file magic, so intermediate trees
+can be written fast and only final archives pay for the strongest
+compression.
+
+Files are written under a temporary name in the target directory and renamed
+into place once complete, so an interrupted run never leaves a truncated file
+that looks finished.
+'''
+import os
+import gzip
+import bz2
+import lzma
+import time
+import zlib
+import struct
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+_HEADER = struct.Struct('>2i')
+
+## fixed-width record written by TAQTradesReader.rewrite, the layout of struct '>QHIf'
+TRADE_RECORD = np.dtype([('ts', '>u8'), ('tickerId', '>u2'), ('size', '>u4'), ('price', '>f4')])
+
+
+class TAQCodec(object):
+    '''
+    Output codec policy: one of CODECS and, except for raw, a compression
+    level (a preset for lzma). The level defaults to the codec's own default.
+    A codec can also be given as a string such as 'gzip:1', 'pgzip:6' or 'raw'.
+    threads only applies to pgzip and defaults to the number of cores.
+    '''
+    CODECS = ('gzip', 'pgzip', 'raw', 'lzma', 'bz2')
+    DEFAULT_LEVELS = {'gzip': 9, 'pgzip': 6, 'raw': None, 'lzma': 6, 'bz2': 9}
+
+    def __init__(self, codec='gzip', level=None, threads=None):
+        if codec not in self.CODECS:
+            raise ValueError('Unknown codec %s' % codec)
+        if level is None:
+            level = self.DEFAULT_LEVELS[codec]
+        elif codec == 'raw':
+            raise ValueError('raw output takes no compression level')
+        self.codec = codec
+        self.level = level
+        self.threads = threads
+
+    def __repr__(self):
+        if self.level is None:
+            return 'TAQCodec(%r)' % self.codec
+        return 'TAQCodec(%r, %d)' % (self.codec, self.level)
+
+    @staticmethod
+    def parse(spec):
+        if isinstance(spec, TAQCodec):
+            return spec
+        if spec is None:
+            return TAQCodec()
+        codec, _, level = spec.partition(':')
+        return TAQCodec(codec, int(level) if level else None)
+
+    def open(self, filePathName):
+        if self.codec == 'gzip':
+            return gzip.open(filePathName, "wb", compresslevel=self.level)
+        if self.codec == 'pgzip':
+            return ParallelGzipWriter(filePathName, self.level, nThreads=self.threads)
+        if self.codec == 'lzma':
+            return lzma.open(filePathName, "wb", preset=self.level)
+        if self.codec == 'bz2':
+            return bz2.open(filePathName, "wb", compresslevel=self.level)
+        return open(filePathName, "wb")
+
+
+class ParallelGzipWriter(object):
+    '''
+    Write-only file object that produces a single, standard gzip member
+    compressed on a thread pool, in the manner of pigz. The input is cut
+    into blocks of blockSize bytes. Each block is deflated independently,
+    primed with the last 32 KiB of the block before it, and ended with a sync
+    flush so the raw deflate streams can simply be concatenated; only the
+    last block is finished. zlib releases the GIL while it compresses, so
+    the blocks really run in parallel. Anything that reads gzip, including
+    gzip.open and the TAQ readers, reads the result.
+    '''
+    WINDOW = 1 << 15
+
+    def __init__(self, filePathName, level=6, blockSize=1 << 20, nThreads=None):
+        self._out = open(filePathName, 'wb')
+        self._level = level
+        self._blockSize = blockSize
+        self._nThreads = nThreads or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(self._nThreads)
+        self._pending = collections.deque()
+        self._buffer = bytearray()
+        self._dictionary = b''
+        self._crc = 0
+        self._size = 0
+        ## magic, deflate, no flags, mtime, no extra flags, unknown OS
+        self._out.write(b'\x1f\x8b\x08\x00' + struct.pack('<I', int(time.time())) + b'\x00\xff')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        self._buffer += data
+        while len(self._buffer) >= self._blockSize:
+            block = bytes(self._buffer[:self._blockSize])
+            del self._buffer[:self._blockSize]
+            self._submit(block, False)
+        return len(data)
+
+    def _submit(self, block, last):
+        self._pending.append(self._executor.submit(_deflateBlock, block, self._level,
+                                                   self._dictionary, last))
+        self._dictionary = block[-self.WINDOW:]
+        ## keep a bounded number of blocks in flight
+        while len(self._pending) > 2 * self._nThreads:
+            self._out.write(self._pending.popleft().result())
+
+    def close(self):
+        if self._out is None:
+            return
+        try:
+            self._submit(bytes(self._buffer), True)
+            self._buffer = bytearray()
+            while self._pending:
+                self._out.write(self._pending.popleft().result())
+            self._out.write(struct.pack('<II', self._crc & 0xffffffff, self._size & 0xffffffff))
+        finally:
+            self._executor.shutdown()
+            self._out.close()
+            self._out = None
+
+def _deflateBlock(block, level, dictionary, last):
+    ## raw deflate (no zlib header); BFINAL is only set on the last block
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, 9)
+    return compressor.compress(block) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def writeColumns(filePathName, secsFromEpocToMidn, columns, dtypes, codec=None):
+    '''
+    Write columns (arrays or sequences of equal length) to filePathName,
+    each converted to the matching on-disk dtype in dtypes, through codec
+    (a TAQCodec or its string form, gzip level 9 by default).
+    '''
+    n = len(columns[0])
+    for column in columns:
+        if len(column) != n:
+            raise ValueError('Columns of different lengths for %s' % filePathName)
+    def write(out):
+        out.write(_HEADER.pack(secsFromEpocToMidn, n))
+        for column, dtype in zip(columns, dtypes):
+            out.write(np.ascontiguousarray(column, dtype=dtype))
+    _writeAtomically(filePathName, codec, write)
+
+def writeRecords(filePathName, records, codec=None):
+    '''
+    Write a structured array as back-to-back fixed-width records, no header.
+    '''
+    _writeAtomically(filePathName, codec, lambda out: out.write(np.ascontiguousarray(records)))
+
+def _createTemporary(directory, name):
+    ## like tempfile.mkstemp, but with the permissions open() gives a new file under the
+    ## process umask rather than 0o600, so the renamed file looks like any other output
+    for _ in range(100):
+        tmpPath = os.path.join(directory, '.%s%s.tmp' % (name, os.urandom(6).hex()))
+        try:
+            os.close(os.open(tmpPath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+            return tmpPath
+        except FileExistsError:
+            continue
+    raise FileExistsError('No temporary name left for %s in %s' % (name, directory))
+
+def replaceFile(filePathName, write, opener=None):
+    '''
+    Write filePathName through a temporary file next to it that replaces it
+    once complete, so no reader sees a partial file: write(out) fills the
+    file object opener(tmpPath) returns, a binary file by default. The file
+    gets the permissions of any other output (see _createTemporary).
+    '''
+    directory, name = os.path.split(os.path.abspath(filePathName))
+    tmpPath = _createTemporary(directory, name)
+    try:
+        out = open(tmpPath, 'wb') if opener is None else opener(tmpPath)
+        try:
+            write(out)
+        finally:
+            out.close()
+        os.replace(tmpPath, filePathName)
+    except BaseException:
+        os.remove(tmpPath)
+        raise
+
+def _writeAtomically(filePathName, codec, write):
+    ## write(out) fills filePathName through the codec
+    replaceFile(filePathName, write, TAQCodec.parse(codec).open)
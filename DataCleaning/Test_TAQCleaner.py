@@ -2,10 +2,19 @@ import unittest
 import pandas as pd
 import numpy as np
 import datetime
-from TAQCleaner import TAQCleaner
+import matplotlib.pyplot as plt
+from TAQCleaner import TAQCleaner, TAQStreamCleaner, outlierMask, beginSweep, sweepPath, main, decimateMinMax, quoteSanityMask,\
+    rollingMedianMAD, cleaningWindows, MAD_SCALE, writeCleaningSummary
 import gzip
 import struct
 import os
+import tempfile
+import shutil
+from unittest import mock
+from TAQTradesReader import TAQTradesReader
+from TAQQuotesReader import TAQQuotesReader
+from TAQOutliers import readOutliers, openOutliers, outliersPath
+from TAQManifest import TAQManifest, fileState
 
 def generate_fake_data(workingDir,type = None):
     if not os.path.exists(workingDir):
@@ -58,6 +67,24 @@ def generate_fake_data(workingDir,type = None):
     
 
     
+## the tick by tick rule cleaningData used to apply
+def loopOutliers(prices, K, gamma_multiplier):
+    half_window = int((K-1)/2)
+    N = len(prices)
+    outlierIdx = []
+    for i in range(N):
+        if i<half_window:
+            left_bound, right_bound = 0, K
+        elif N - i < 3:
+            left_bound, right_bound = N-K, N
+        else:
+            left_bound, right_bound = i-half_window, i+half_window+1
+        _std = np.std(prices[left_bound:right_bound])
+        _mean = np.mean(prices[left_bound:right_bound])
+        if abs(prices[i] - _mean) > 1.5*_std + gamma_multiplier * _mean:
+            outlierIdx.append(i)
+    return outlierIdx
+
 class Test_TAQCleaner(unittest.TestCase):
     def fake_data_generate(self):
         workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/FakeData'
@@ -109,6 +136,418 @@ class Test_TAQCleaner(unittest.TestCase):
 
         trade_cleaner.plotCleaningTradesResultGraph()
         quote_cleaner.plotCleaningQuotesResultGraph()
+        ## the outliers are one collection of vertical lines on top of the mid prices
+        lines = plt.gcf().axes[0].collections[-1]
+        self.assertEqual(len(lines.get_segments()), 1)
+        plt.close('all')
+
+    def testSessionWindow(self):
+        self.fake_data_generate()
+        workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/FakeData'
+        tradeDir = os.path.join(workingDir,'DataSet/trade_SP_Adj/20070620/FAKE_trades.binRT')
+
+        ## ticks 5 to 29, the 999 print is the 16th of them
+        trade_cleaner = TAQCleaner(tradeDir, type = 'trade', sessionWindow = (3425000, 3450000))
+        trade_cleaner.processPrices()
+        trade_cleaner.processTimestamps()
+        trade_cleaner.cleaningData(K=11, gamma_multiplier=0.00005)
+
+        self.assertEqual(len(trade_cleaner.getPrices()), 25)
+        self.assertEqual(trade_cleaner.getTimestamps()[0],
+                pd.Timestamp(datetime.datetime.fromtimestamp(1182312000) +
+                    datetime.timedelta(milliseconds = 3425000)))
+        self.assertEqual(trade_cleaner.outlierIdx, [15])
+
+    def testRewriteCleaned(self):
+        self.fake_data_generate()
+        workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/FakeData'
+        tradeDir = os.path.join(workingDir,'DataSet/trade_SP_Adj/20070620/FAKE_trades.binRT')
+        quoteDir = os.path.join(workingDir, 'DataSet/quote_SP_Adj/20070620/FAKE_quotes.binRQ')
+        outDir = tempfile.mkdtemp()
+        try:
+            trade_cleaner = TAQCleaner(tradeDir, type = 'trade', sessionWindow = (3425000, 3450000))
+            trade_cleaner.processPrices()
+            trade_cleaner.processTimestamps()
+            trade_cleaner.cleaningData(K=11, gamma_multiplier=0.00005)
+            self.assertAlmostEqual(trade_cleaner.getOutLierPercent(), 1/25)
+            trade_cleaner.rewriteToFile(os.path.join(outDir, 'FAKE_trades.binRT'))
+            cleaned = TAQTradesReader(os.path.join(outDir, 'FAKE_trades.binRT'))
+            self.assertEqual(cleaned.getN(), 24)
+            self.assertEqual(cleaned.getPriceArray().max(), 1.0)
+            ## ticks 5 to 29 without tick 20, sizes follow their ticks
+            expected = [i for i in range(5, 30) if i != 20]
+            self.assertEqual(cleaned.getMillisFromMidnArray().tolist(), [3420000 + i*1000 for i in expected])
+            self.assertEqual(cleaned.getSizeArray().tolist(), [int((i+0.01)*10) for i in expected])
+
+            quote_cleaner = TAQCleaner(quoteDir, type = 'quote')
+            quote_cleaner.processPrices()
+            quote_cleaner.processTimestamps()
+            quote_cleaner.cleaningData(K=21, gamma_multiplier=0.00005)
+            quote_cleaner.rewriteToFile(os.path.join(outDir, 'FAKE_quotes.binRQ'))
+            cleaned = TAQQuotesReader(os.path.join(outDir, 'FAKE_quotes.binRQ'))
+            self.assertEqual(cleaned.getN(), 40)
+            self.assertEqual(cleaned.getBidSizeArray().tolist(), [i*10 for i in range(41) if i != 20])
+            self.assertEqual(len(quote_cleaner.getCleanedQuotesDataFrame()), 40)
+        finally:
+            shutil.rmtree(outDir)
+
+    def testOutlierFile(self):
+        self.fake_data_generate()
+        workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/FakeData'
+        quoteDir = os.path.join(workingDir, 'DataSet/quote_SP_Adj/20070620/FAKE_quotes.binRQ')
+        outDir = tempfile.mkdtemp()
+        try:
+            cleaner = TAQCleaner(quoteDir, type = 'quote', sessionWindow = (3425000, 3450000))
+            cleaner.processPrices()
+            cleaner.cleaningData(K=11, gamma_multiplier=0.00005)
+            ## the report counts the ticks of the session window only
+            report = cleaner.getCleaningReport(0)
+            self.assertEqual((report.n, report.nOut), (25, 24))
+            self.assertAlmostEqual(report.outlierFraction, 1 / 25)
+            cleaner.rewriteToFile(os.path.join(outDir, 'FAKE_quotes.binRQ'))
+            cleaner.writeOutlierFile(os.path.join(outDir, 'FAKE_quotes.binRQ.outliers'))
+
+            outliers = readOutliers(os.path.join(outDir, 'FAKE_quotes.binRQ.outliers'))
+            self.assertEqual((outliers.K, outliers.gamma_multiplier), (11, 0.00005))
+            self.assertEqual((outliers.n, outliers.start, outliers.stop), (41, 5, 30))
+            self.assertEqual(outliers.rows.tolist(), [20])
+            self.assertEqual(outliers.source, os.path.normpath(quoteDir))
+
+            ## the outlier file gives the ticks of the rewritten file, decoding only the columns used
+            rewritten = TAQQuotesReader(os.path.join(outDir, 'FAKE_quotes.binRQ'))
+            filtered = openOutliers(os.path.join(outDir, 'FAKE_quotes.binRQ.outliers'),
+                                    columns=('millis', 'bidPrice', 'askPrice'))
+            self.assertEqual(filtered.getN(), 24)
+            self.assertEqual(filtered.getSecsFromEpocToMidn(), rewritten.getSecsFromEpocToMidn())
+            for getter in ['getMillisFromMidnArray', 'getBidPriceArray', 'getAskPriceArray',
+                           'getBidSizeArray', 'getAskSizeArray']:
+                self.assertEqual(getattr(filtered, getter)().tolist(), getattr(rewritten, getter)().tolist())
+
+            ## a source changed in place, even with the same N and size, is refused; a touch is not
+            sourcePath = os.path.join(outDir, 'source', 'FAKE_quotes.binRQ')
+            os.makedirs(os.path.dirname(sourcePath))
+            shutil.copy(quoteDir, sourcePath)
+            cleaner = TAQCleaner(sourcePath, type = 'quote')
+            cleaner.processPrices()
+            cleaner.cleaningData(K=11, gamma_multiplier=0.00005)
+            cleaner.writeOutlierFile(sourcePath + '.outliers')
+            os.utime(sourcePath, ns=(0, 0))
+            self.assertEqual(openOutliers(sourcePath + '.outliers').getN(), 40)
+            with open(sourcePath, 'r+b') as f:
+                f.seek(-1, os.SEEK_END)
+                last = f.read(1)
+                f.seek(-1, os.SEEK_END)
+                f.write(bytes([last[0] ^ 1]))
+            self.assertRaises(ValueError, openOutliers, sourcePath + '.outliers')
+        finally:
+            shutil.rmtree(outDir)
+
+    def testSweep(self):
+        self.fake_data_generate()
+        workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/FakeData'
+        tradeDir = os.path.join(workingDir,'DataSet/trade_SP_Adj/20070620/FAKE_trades.binRT')
+        outDir = tempfile.mkdtemp()
+        try:
+            readingPath = os.path.join(outDir, 'trade_SP_Adj', '20070620', 'FAKE_trades.binRT')
+            os.makedirs(os.path.dirname(readingPath))
+            shutil.copy(tradeDir, readingPath)
+            self.assertEqual(sweepPath(readingPath, 21, 0.00005),
+                    os.path.join(outDir, 'trade_SP_Adj_cleaned_21_5e-05', '20070620', 'FAKE_trades.binRT'))
+            self.assertEqual(sweepPath(os.path.join(outDir, 'trade_SP_Adj_v2', '20070620', 'FAKE_trades.binRT'), 21, 0.00005),
+                    os.path.join(outDir, 'trade_SP_Adj_cleaned_21_5e-05_v2', '20070620', 'FAKE_trades.binRT'))
+            ## raw or already cleaned stages are refused, and the raw source is left as it was
+            rawPath = os.path.join(outDir, 'trade_SP', '20070620', 'FAKE_trades.binRT')
+            os.makedirs(os.path.dirname(rawPath))
+            shutil.copy(tradeDir, rawPath)
+            rawState = fileState(rawPath)
+            self.assertRaises(ValueError, beginSweep, rawPath, [21], [0.00005])
+            self.assertEqual(fileState(rawPath), rawState)
+            self.assertRaises(ValueError, sweepPath,
+                              os.path.join(outDir, 'quote_SP_Adj_cleaned_21_5e-05', '20070620', 'FAKE_quotes.binRQ'),
+                              21, 0.00005)
+            Ks = [5, 21]
+            gammas = [0.0, 0.00005, 1.0]
+            reports, masks = beginSweep(readingPath, Ks, gammas)
+            self.assertEqual([report.n for report in reports], [41] * 6)
+            self.assertEqual(sorted((report.K, report.gamma_multiplier) for report in reports),
+                             sorted((K, g) for K in Ks for g in gammas))
+            self.assertEqual(sorted(masks), sorted((K, g) for K in Ks for g in gammas))
+            for report in reports:
+                outliers = np.count_nonzero(masks[(report.K, report.gamma_multiplier)])
+                self.assertEqual(report.nOut, 41 - outliers)
+                self.assertAlmostEqual(report.outlierFraction, outliers / 41)
+                ## the 999 spike among prices around 10
+                self.assertGreater(report.maxDeviation, 1.0)
+            summary = writeCleaningSummary(reports, os.path.join(outDir, 'summary.npz'))
+            with np.load(os.path.join(outDir, 'summary.npz')) as columns:
+                self.assertEqual(columns['ticker'].tolist(), ['FAKE'] * 6)
+                self.assertEqual(columns['date'].tolist(), ['20070620'] * 6)
+                self.assertEqual(columns['nOut'].tolist(), summary['nOut'].tolist())
+            for K in Ks:
+                for gamma_multiplier in gammas:
+                    ## same outliers and output as cleaning with that pair alone
+                    cleaner = TAQCleaner(readingPath, type = 'trade')
+                    self.assertIsNone(cleaner.maxDeviations)
+                    cleaner.processPrices()
+                    cleaner.cleaningData(K=K, gamma_multiplier=gamma_multiplier)
+                    self.assertEqual(masks[(K, gamma_multiplier)].tolist(), cleaner.outlierMask.tolist())
+                    cleaned = TAQTradesReader(sweepPath(readingPath, K, gamma_multiplier))
+                    self.assertEqual(cleaned.getN(), 41 - len(cleaner.outlierIdx))
+            ## a gamma of 1 tolerates nothing but the 999 spike
+            self.assertEqual(np.flatnonzero(masks[(21, 1.0)]).tolist(), [20])
+            ## the outlier files of a sweep hash the source once
+            with mock.patch('TAQCleaner.fileState', wraps=fileState) as hashed:
+                beginSweep(readingPath, Ks, gammas, outliersOnly=True)
+            self.assertEqual(hashed.call_count, 1)
+            outliers = readOutliers(outliersPath(sweepPath(readingPath, 5, 0.0)))
+            self.assertEqual(outliers.sourceState, fileState(readingPath))
+        finally:
+            shutil.rmtree(outDir)
+
+    def testDriver(self):
+        self.fake_data_generate()
+        workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/FakeData'
+        outDir = tempfile.mkdtemp()
+        try:
+            for stage in ['trade_SP_Adj', 'quote_SP_Adj']:
+                shutil.copytree(os.path.join(workingDir, 'DataSet', stage), os.path.join(outDir, 'Dataset', stage))
+            ## a second, shorter trade date: trades and quotes no longer pair up by date
+            shortDir = os.path.join(outDir, 'Dataset', 'trade_SP_Adj', '20070621')
+            os.makedirs(shortDir)
+            TAQTradesReader(os.path.join(outDir, 'Dataset', 'trade_SP_Adj', '20070620', 'FAKE_trades.binRT'))\
+                .rewrite_adj(os.path.join(shortDir, 'FAKE_trades.binRT'), 1, 1)
+
+            reports = main(outDir, n_cores=2, progress_bar=False)
+            self.assertEqual(sorted(os.path.relpath(report.path, outDir) for report in reports),
+                             [os.path.join('Dataset', 'quote_SP_Adj', '20070620', 'FAKE_quotes.binRQ'),
+                              os.path.join('Dataset', 'trade_SP_Adj', '20070620', 'FAKE_trades.binRT'),
+                              os.path.join('Dataset', 'trade_SP_Adj', '20070621', 'FAKE_trades.binRT')])
+            cleaned = os.path.join(outDir, 'Dataset', 'trade_SP_Adj_cleaned', '20070621', 'FAKE_trades.binRT')
+            self.assertEqual(TAQTradesReader(cleaned).getN(), 40)
+            ## the reports are also written as one table per run
+            reportDir = os.path.join(outDir, 'Dataset', 'cleaning_reports')
+            self.assertEqual(len(os.listdir(reportDir)), 1)
+            summary = pd.read_csv(os.path.join(reportDir, os.listdir(reportDir)[0]), dtype={'date': str})
+            summary = summary.sort_values(['type', 'date']).reset_index(drop=True)
+            self.assertEqual(summary['type'].tolist(), ['quote', 'trade', 'trade'])
+            self.assertEqual(summary['date'].tolist(), ['20070620', '20070620', '20070621'])
+            self.assertEqual(summary['ticker'].tolist(), ['FAKE'] * 3)
+            self.assertEqual(summary['K'].tolist(), [21] * 3)
+            self.assertEqual(summary['nOut'][2], 40)
+            self.assertEqual(summary['rejected'].tolist(), [1, 0, 0])
+            self.assertAlmostEqual(summary['outlierFraction'][2], 1 / 41)
+
+            ## files cleaned since their content last changed are skipped, even when touched
+            self.assertEqual(main(outDir, n_cores=2, progress_bar=False), [])
+            self.assertEqual(len(os.listdir(reportDir)), 1)
+            later = os.path.getmtime(cleaned) + 10
+            os.utime(os.path.join(shortDir, 'FAKE_trades.binRT'), (later, later))
+            self.assertEqual(main(outDir, n_cores=2, progress_bar=False), [])
+            ## a file whose content changed is cleaned again
+            TAQTradesReader(os.path.join(shortDir, 'FAKE_trades.binRT')).rewrite_adj(
+                    os.path.join(shortDir, 'FAKE_trades.binRT'), 2, 1)
+            reports = main(outDir, n_cores=2, progress_bar=False)
+            self.assertEqual([report.path for report in reports], [os.path.join(shortDir, 'FAKE_trades.binRT')])
+            self.assertEqual(reports[0].n, 41)
+            ## the summary of the run still covers the files it skipped
+            self.assertEqual(len(os.listdir(reportDir)), 2)
+            summary = pd.read_csv(os.path.join(reportDir, sorted(os.listdir(reportDir))[-1]))
+            self.assertEqual(len(summary), 3)
+            self.assertEqual(summary[summary['thisRun']]['path'].tolist(), [reports[0].path])
+            self.assertEqual(TAQTradesReader(cleaned).getSize(1), 2 * int(1.01*10))
+            ## new parameters clean everything again, as outlier files replacing the cleaned files
+            self.assertEqual(len(main(outDir, K=11, n_cores=2, progress_bar=False, outliersOnly=True)), 3)
+            self.assertFalse(os.path.exists(cleaned))
+            self.assertTrue(os.path.exists(cleaned + '.outliers'))
+            ## the outputs of a deleted input go with it
+            shutil.rmtree(shortDir)
+            self.assertEqual(main(outDir, K=11, n_cores=2, progress_bar=False, outliersOnly=True), [])
+            self.assertFalse(os.path.exists(cleaned + '.outliers'))
+            self.assertEqual(len(TAQManifest(os.path.join(outDir, 'Dataset', 'cleaning.manifest'))), 2)
+        finally:
+            shutil.rmtree(outDir)
+
+    def testDriverFailure(self):
+        self.fake_data_generate()
+        workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/FakeData'
+        outDir = tempfile.mkdtemp()
+        try:
+            for stage in ['trade_SP_Adj', 'quote_SP_Adj']:
+                shutil.copytree(os.path.join(workingDir, 'DataSet', stage), os.path.join(outDir, 'Dataset', stage))
+            ## a truncated file fails on its own, the others are cleaned and recorded
+            badPath = os.path.join(outDir, 'Dataset', 'trade_SP_Adj', '20070620', 'BAD_trades.binRT')
+            with open(os.path.join(outDir, 'Dataset', 'trade_SP_Adj', '20070620', 'FAKE_trades.binRT'), 'rb') as f:
+                head = f.read(20)
+            with open(badPath, 'wb') as f:
+                f.write(head)
+            failures = []
+            reports = main(outDir, n_cores=2, progress_bar=False, failures=failures)
+            self.assertEqual(len(reports), 2)
+            self.assertEqual([failure.path for failure in failures], [badPath])
+            self.assertIn('Error', failures[0].error)
+            self.assertEqual(len(TAQManifest(os.path.join(outDir, 'Dataset', 'cleaning.manifest'))), 2)
+            ## and is tried again by the next run
+            failures = []
+            self.assertEqual(main(outDir, n_cores=2, progress_bar=False, failures=failures), [])
+            self.assertEqual(len(failures), 1)
+        finally:
+            shutil.rmtree(outDir)
+
+    def testQuoteFilter(self):
+        bid = np.full(200, 10.0)
+        ask = np.full(200, 10.02)
+        bidSize = np.full(200, 5)
+        askSize = np.full(200, 5)
+        ask[10] = 9.9           # crossed
+        bid[20] = 0.0           # non-positive price
+        askSize[30] = 0         # non-positive size
+        bid[40], ask[40] = -1.0, -2.0   # both
+        ask[50] = 11.0          # wide spread
+        ask[60] = 10.05         # wider than usual, within the multiple
+        rejected, counts = quoteSanityMask(bid, ask, bidSize, askSize)
+        self.assertEqual(np.flatnonzero(rejected).tolist(), [10, 20, 30, 40])
+        self.assertEqual((counts.crossed, counts.nonPositive, counts.wideSpread, counts.rejected), (2, 3, 0, 4))
+        rejected, counts = quoteSanityMask(bid, ask, bidSize, askSize, spreadMultiple=5, spreadWindow=21)
+        self.assertEqual(np.flatnonzero(rejected).tolist(), [10, 20, 30, 40, 50])
+        self.assertEqual(counts.wideSpread, 1)
+
+        self.fake_data_generate()
+        workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/FakeData'
+        quoteDir = os.path.join(workingDir, 'DataSet/quote_SP_Adj/20070620/FAKE_quotes.binRQ')
+        cleaner = TAQCleaner(quoteDir, type = 'quote')
+        cleaner.processPrices()
+        ## the first quote has sizes of 0, the 999 spike spreads as wide as the others
+        self.assertEqual(cleaner.filterQuotes(spreadMultiple=5).rejected, 1)
+        cleaner.cleaningData(K=21, gamma_multiplier=0.00005)
+        self.assertEqual(cleaner.outlierIdx, [0, 20])
+        ## the rolling test saw the 40 other quotes only
+        self.assertEqual(cleaner.outlierMask[1:].tolist(), outlierMask(cleaner.getPrices()[1:], 21, 0.00005).tolist())
+
+        ## the drivers filter quotes unless sanityFilter is False, with or without spreadMultiple
+        outDir = tempfile.mkdtemp()
+        try:
+            readingPath = os.path.join(outDir, 'quote_SP_Adj', '20070620', 'FAKE_quotes.binRQ')
+            os.makedirs(os.path.dirname(readingPath))
+            shutil.copy(quoteDir, readingPath)
+            for sanityFilter, nOut in [(True, 39), (False, 40)]:
+                reports, masks = beginSweep(readingPath, [21], [0.00005], outliersOnly=True, sanityFilter=sanityFilter)
+                self.assertEqual(reports[0].nOut, nOut)
+                ## the report keeps what the filter rejected, by rule
+                self.assertEqual((reports[0].nonPositive, reports[0].rejected), (1, 1) if sanityFilter else (0, 0))
+                self.assertEqual((reports[0].crossed, reports[0].wideSpread), (0, 0))
+        finally:
+            shutil.rmtree(outDir)
+
+    def testDecimation(self):
+        rng = np.random.default_rng(1)
+        n = 100000
+        ts = pd.date_range('2007-06-20 09:30', periods=n, freq='50ms')
+        prices = np.cumsum(rng.normal(0, 0.01, n))
+        prices[12345] += 10
+        keep = decimateMinMax(ts, prices, 500)
+        self.assertLessEqual(len(keep), 2 * 500 + 2)
+        self.assertTrue(np.all(np.diff(keep) > 0))
+        self.assertEqual(keep[0], 0)
+        self.assertEqual(keep[-1], n - 1)
+        self.assertIn(12345, keep)
+        ## every bucket keeps its own extremes
+        bucket = np.minimum(np.arange(n) * 500 // (n - 1), 499)
+        for b in [0, 17, 499]:
+            inBucket = np.flatnonzero(bucket == b)
+            kept = np.intersect1d(keep, inBucket)
+            self.assertEqual(prices[kept].max(), prices[inBucket].max())
+            self.assertEqual(prices[kept].min(), prices[inBucket].min())
+        ## short series are kept whole
+        self.assertEqual(decimateMinMax(ts[:10], prices[:10], 500).tolist(), list(range(10)))
+        self.assertEqual(decimateMinMax(ts, prices, None).tolist(), list(range(n)))
+
+    def testVectorizedCleaning(self):
+        rng = np.random.default_rng(42)
+        ## short days exercise the windows near both ends, including N < K
+        for N in [1, 2, 5, 20, 21, 22, 300]:
+            for K in [3, 10, 21]:
+                prices = np.round(50 + np.cumsum(rng.normal(0, 0.02, N)), 2)
+                spikes = rng.random(N) < 0.05
+                prices[spikes] *= 1.1
+                prices = prices.tolist()
+                for gamma_multiplier in [0.0, 0.00005]:
+                    self.assertEqual(np.flatnonzero(outlierMask(prices, K, gamma_multiplier)).tolist(),
+                                     loopOutliers(prices, K, gamma_multiplier))
+
+    def testAbsurdTicks(self):
+        ## fat-finger ticks orders of magnitude off, whose rounding error any sum over them
+        ## would carry far beyond their neighbourhood, and a day jumping between two levels
+        rng = np.random.default_rng(0)
+        N = 5000
+        dirty = np.round(100 + np.cumsum(rng.normal(0, 0.01, N)), 2)
+        dirty[rng.choice(N, 5, replace=False)] = 99999
+        bimodal = np.where(rng.random(N) < 0.5, 50.0, 50.5)
+        bimodal[[10, 2500]] = 99999
+        for prices, gamma_multiplier in [(dirty, 0.00005), (bimodal, 0.0)]:
+            expected = loopOutliers(prices.tolist(), 21, gamma_multiplier)
+            self.assertEqual(np.flatnonzero(outlierMask(prices, 21, gamma_multiplier)).tolist(), expected)
+            stream = TAQStreamCleaner(21, gamma_multiplier)
+            verdicts = [stream.push(prices[lo:lo + 999]) for lo in range(0, N, 999)] + [stream.close()]
+            self.assertEqual(np.flatnonzero(np.concatenate(verdicts)).tolist(), expected)
+            ## tick by tick, from the running sums
+            stream = TAQStreamCleaner(21, gamma_multiplier)
+            verdicts = []
+            for price in prices.tolist():
+                verdicts.extend(stream.pushTick(price))
+            verdicts.extend(stream.close())
+            self.assertEqual(np.flatnonzero(verdicts).tolist(), expected)
+
+    def testMedianCleaning(self):
+        rng = np.random.default_rng(11)
+        for N in [1, 2, 5, 20, 21, 22, 300]:
+            for K in [3, 10, 21]:
+                prices = np.round(50 + np.cumsum(rng.normal(0, 0.02, N)), 2)
+                spikes = rng.random(N) < 0.05
+                prices[spikes] *= 1.1
+                _median, _mad = rollingMedianMAD(prices, K)
+                left, right = cleaningWindows(N, K)
+                expected = []
+                for i in range(N):
+                    window = prices[left[i]:right[i]]
+                    self.assertEqual(_median[i], np.median(window))
+                    self.assertEqual(_mad[i], np.median(np.abs(window - np.median(window))))
+                    if abs(prices[i] - _median[i]) > 1.5*MAD_SCALE*_mad[i] + 0.00005 * _median[i]:
+                        expected.append(i)
+                self.assertEqual(np.flatnonzero(outlierMask(prices, K, 0.00005, method='median')).tolist(), expected)
+        self.assertRaises(ValueError, outlierMask, [1.0, 2.0], 3, 0.0, method='trimmed')
+
+        self.fake_data_generate()
+        workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/FakeData'
+        tradeDir = os.path.join(workingDir,'DataSet/trade_SP_Adj/20070620/FAKE_trades.binRT')
+        cleaner = TAQCleaner(tradeDir, type = 'trade')
+        cleaner.processPrices()
+        cleaner.cleaningData(K=21, gamma_multiplier=0.00005, method='median')
+        self.assertEqual(cleaner.outlierIdx, [20])
+        masks = cleaner.cleaningSweep([5, 21], [0.00005], method='median')
+        self.assertEqual(np.flatnonzero(masks[(21, 0.00005)]).tolist(), [20])
+
+    def testStreamCleaner(self):
+        rng = np.random.default_rng(7)
+        for N in [0, 1, 5, 20, 21, 22, 500]:
+            for K in [3, 10, 21]:
+                prices = np.round(50 + np.cumsum(rng.normal(0, 0.02, N)), 2)
+                spikes = rng.random(N) < 0.05
+                prices[spikes] *= 1.1
+                for gamma_multiplier in [0.0, 0.00005]:
+                    batch = outlierMask(prices, K, gamma_multiplier)
+                    for chunkRows in [1, 7, 1000]:
+                        cleaner = TAQStreamCleaner(K, gamma_multiplier)
+                        verdicts = []
+                        for lo in range(0, N, chunkRows):
+                            verdicts.append(cleaner.push(prices[lo:lo + chunkRows]))
+                            ## the ring buffer never grows
+                            self.assertLessEqual(len(cleaner._ring), 4 * K)
+                        verdicts.append(cleaner.close())
+                        self.assertEqual(cleaner.getN(), N)
+                        self.assertEqual(np.concatenate(verdicts).tolist(), batch.tolist())
+        ## a single price can be pushed as a scalar
+        cleaner = TAQStreamCleaner(3, 0.0)
+        self.assertEqual(len(cleaner.push(1.0)), 0)
 
 if __name__ == '__main__':
     workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/FakeData'
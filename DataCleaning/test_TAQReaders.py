@@ -0,0 +1,445 @@
+import unittest
+import tempfile
+import shutil
+import gzip
+import struct
+import os
+import datetime
+from unittest import mock
+import numpy as np
+import pandas as pd
+from TAQTradesReader import TAQTradesReader
+from TAQQuotesReader import TAQQuotesReader
+import TAQDecodeCache
+import TAQColumnCache
+from TAQColumnStream import TAQColumnStream, TRADE_COLUMNS, QUOTE_COLUMNS, sniffCodec
+from TAQWriter import TAQCodec, ParallelGzipWriter, writeColumns
+import TAQPackStore
+from TAQTime import millisToDatetimeIndex
+from TAQTickerStore import TAQTickerStore, buildTickerStores
+from TAQOutliers import writeOutliers
+from TAQManifest import TAQManifest
+
+def generate_fake_data(workingDir, type = None):
+    if not os.path.exists(workingDir):
+        os.makedirs(workingDir)
+    ## seconds to epoch and timestamps shared by both files
+    secs = 1182312000
+    n = 41
+    ts = [34200000 + i*1000 for i in range(n)]
+    if type == 'trade':
+        prices = [10 + 0.01*i for i in range(n)]
+        sizes = [100*(i+1) for i in range(n)]
+        filePathName = os.path.join(workingDir,'FAKE_trades.binRT')
+        out = gzip.open(filePathName,"wb")
+        out.write(struct.pack(">2i", secs, n))
+        out.write(struct.pack(">%di" % n, *ts))
+        out.write(struct.pack(">%di" % n, *sizes))
+        out.write(struct.pack(">%df" % n, *prices))
+        out.close()
+        return filePathName
+    if type == 'quote':
+        bid_prices = [10 - 0.01*i for i in range(n)]
+        ask_prices = [10.05 + 0.01*i for i in range(n)]
+        bid_sizes = [i*10 for i in range(n)]
+        ask_sizes = [i*20 for i in range(n)]
+        filePathName = os.path.join(workingDir,'FAKE_quotes.binRQ')
+        out = gzip.open(filePathName,"wb")
+        out.write(struct.pack(">2i", secs, n))
+        out.write(struct.pack(">%di" % n, *ts))
+        out.write(struct.pack(">%di" % n, *bid_sizes))
+        out.write(struct.pack(">%df" % n, *bid_prices))
+        out.write(struct.pack(">%di" % n, *ask_sizes))
+        out.write(struct.pack(">%df" % n, *ask_prices))
+        out.close()
+        return filePathName
+    raise ValueError('Wrong type. trade or quote.')
+
+class Test_TAQReaders(unittest.TestCase):
+    def setUp(self):
+        self.workingDir = tempfile.mkdtemp()
+        self.tradeFile = generate_fake_data(self.workingDir, type='trade')
+        self.quoteFile = generate_fake_data(self.workingDir, type='quote')
+
+    def tearDown(self):
+        shutil.rmtree(self.workingDir)
+
+    def testTradesGetters(self):
+        for nativeEndian in (False, True):
+            reader = TAQTradesReader(self.tradeFile, nativeEndian=nativeEndian)
+            self.assertEqual(reader.getN(), 41)
+            self.assertEqual(reader.getSecsFromEpocToMidn(), 1182312000)
+            self.assertEqual(reader.getMillisFromMidn(40), 34240000)
+            self.assertEqual(reader.getSize(0), 100)
+            self.assertAlmostEqual(reader.getPrice(40), 10.4, 5)
+            ## getters return plain python scalars
+            self.assertIs(type(reader.getSize(1)), int)
+            self.assertIs(type(reader.getPrice(1)), float)
+            ## column arrays agree with the per-record getters
+            self.assertEqual(len(reader.getPriceArray()), reader.getN())
+            self.assertEqual(reader.getPriceArray()[7], reader.getPrice(7))
+            self.assertEqual(reader.getSizeArray().sum(), sum(100*(i+1) for i in range(41)))
+            self.assertTrue(np.all(np.diff(reader.getMillisFromMidnArray()) == 1000))
+
+    def testQuotesGetters(self):
+        for nativeEndian in (False, True):
+            reader = TAQQuotesReader(self.quoteFile, nativeEndian=nativeEndian)
+            self.assertEqual(reader.getN(), 41)
+            self.assertEqual(reader.getMillisFromMidn(reader.getN() - 1), 34240000)
+            self.assertEqual(reader.getBidSize(3), 30)
+            self.assertEqual(reader.getAskSize(3), 60)
+            self.assertAlmostEqual(reader.getBidPrice(40), 9.6, 5)
+            self.assertAlmostEqual(reader.getAskPrice(40), 10.45, 5)
+            self.assertEqual(reader.getAskPriceArray()[5], reader.getAskPrice(5))
+            self.assertEqual(reader.getBidPriceArray()[5], reader.getBidPrice(5))
+            self.assertEqual(reader.getAskSizeArray()[-1], 800)
+            self.assertEqual(reader.getBidSizeArray()[-1], 400)
+
+    def testDecodeCache(self):
+        cacheDir = os.path.join(self.workingDir, 'cache')
+        TAQDecodeCache.enableDecodeCache(cacheDir)
+        try:
+            ## the first read populates the sidecar, the second maps it
+            first = TAQQuotesReader(self.quoteFile)
+            first.getAskPriceArray()
+            self.assertTrue(os.path.exists(TAQDecodeCache.sidecarPath(self.quoteFile)))
+            self.assertIsNotNone(TAQDecodeCache.loadColumns(self.quoteFile, 5))
+            second = TAQQuotesReader(self.quoteFile)
+            self.assertIsInstance(second.getAskPriceArray(), np.memmap)
+            self.assertEqual(second.getN(), first.getN())
+            self.assertTrue(np.array_equal(second.getAskPriceArray(), first.getAskPriceArray()))
+            self.assertEqual(second.getBidSize(3), 30)
+
+            TAQTradesReader(self.tradeFile).getPriceArray()
+            trades = TAQTradesReader(self.tradeFile)
+            self.assertIsInstance(trades.getPriceArray(), np.memmap)
+            self.assertAlmostEqual(trades.getPrice(40), 10.4, 5)
+
+            ## a rewritten source invalidates its sidecar
+            stat = os.stat(self.tradeFile)
+            os.utime(self.tradeFile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            self.assertIsNone(TAQDecodeCache.loadColumns(self.tradeFile, 3))
+            self.assertEqual(TAQTradesReader(self.tradeFile).getSize(0), 100)
+            self.assertIsNotNone(TAQDecodeCache.loadColumns(self.tradeFile, 3))
+        finally:
+            TAQDecodeCache.disableDecodeCache()
+
+    def testColumnStream(self):
+        reader = TAQQuotesReader(self.quoteFile)
+        with TAQColumnStream(self.quoteFile, QUOTE_COLUMNS, chunkBytes=16) as stream:
+            self.assertEqual(stream.getN(), 41)
+            self.assertEqual(stream.getSecsFromEpocToMidn(), 1182312000)
+            ## a row range of one column, skipping the ones before it
+            bidPrices = stream.readColumn(2, 10, 20)
+            self.assertTrue(bidPrices.dtype.isnative)
+            self.assertTrue(np.array_equal(bidPrices, reader.getBidPriceArray()[10:20]))
+            ## chunks of a later column concatenate to the full column
+            chunks = list(stream.iterColumn(4, chunkRows=7))
+            self.assertEqual([len(c) for c in chunks], [7, 7, 7, 7, 7, 6])
+            self.assertTrue(np.array_equal(np.concatenate(chunks), reader.getAskPriceArray()))
+            ## going backwards rewinds the stream
+            self.assertTrue(np.array_equal(stream.readColumn(0), reader.getMillisFromMidnArray()))
+
+        with TAQColumnStream(self.tradeFile, TRADE_COLUMNS, chunkBytes=16, memoryLimit=64) as stream:
+            self.assertRaises(MemoryError, stream.readColumn, 2)
+            sizes = np.concatenate(list(stream.iterColumn(1, chunkRows=8)))
+            self.assertEqual(sizes[-1], 4100)
+
+    def testLazyColumns(self):
+        reader = TAQQuotesReader(self.quoteFile, columns=('millis', 'bidPrice', 'askPrice'))
+        ## only the header is read up front
+        self.assertEqual(reader.getN(), 41)
+        self.assertEqual(reader._columns, [None] * 5)
+        ## the first access decodes the requested columns and skips the sizes
+        self.assertAlmostEqual(reader.getAskPrice(0), 10.05, 5)
+        self.assertEqual([c is not None for c in reader._columns], [True, False, True, False, True])
+        ## an unrequested column is still available
+        self.assertEqual(reader.getBidSize(3), 30)
+        self.assertIsNone(reader._columns[3])
+
+        trades = TAQTradesReader(self.tradeFile, columns=('millis',))
+        self.assertEqual(trades.getMillisFromMidn(0), 34200000)
+        self.assertEqual([c is not None for c in trades._columns], [True, False, False])
+        self.assertRaises(ValueError, TAQTradesReader, self.tradeFile, columns=('bidPrice',))
+
+    def testPeek(self):
+        info = TAQQuotesReader.peek(self.quoteFile)
+        self.assertEqual(info.n, 41)
+        self.assertEqual(info.secsFromEpocToMidn, 1182312000)
+        self.assertEqual(info.firstMillis, 34200000)
+        self.assertEqual(info.lastMillis, 34240000)
+        self.assertIsNone(TAQTradesReader.peek(self.tradeFile, timeSpan=False).lastMillis)
+        self.assertEqual(TAQTradesReader.peekN(self.tradeFile), 41)
+        self.assertEqual(TAQQuotesReader.peekN(self.quoteFile), 41)
+
+    def testSlice(self):
+        reader = TAQTradesReader(self.tradeFile, columns=('price',))
+        window = reader.slice(34205000, 34210000)
+        self.assertEqual((window.start, window.stop), (5, 10))
+        self.assertEqual(sorted(window.columns), ['millis', 'price'])
+        np.testing.assert_array_equal(window.columns['millis'], 34200000 + 1000 * np.arange(5, 10))
+        np.testing.assert_allclose(window.columns['price'], 10 + 0.01 * np.arange(5, 10), rtol=1e-6)
+        ## open bounds, and windows falling between or outside the ticks
+        self.assertEqual(reader.slice(None, 34202500)[:2], (0, 3))
+        self.assertEqual(reader.slice(34238500)[:2], (39, 41))
+        self.assertEqual(reader.slice(34250000, 34260000)[:2], (41, 41))
+        self.assertEqual(reader.slice(34210000, 34205000)[:2], (10, 10))
+        quotes = TAQQuotesReader(self.quoteFile).slice(34200000, 34203000)
+        self.assertEqual((quotes.start, quotes.stop), (0, 3))
+        self.assertEqual(len(quotes.columns), 5)
+        np.testing.assert_array_equal(quotes.columns['bidSize'], [0, 10, 20])
+
+    def testRewriters(self):
+        trades = TAQTradesReader(self.tradeFile)
+        adjPath = os.path.join(self.workingDir, 'ADJ_trades.binRT')
+        trades.rewrite_adj(adjPath, 1.5, 2.0)
+        adjusted = TAQTradesReader(adjPath)
+        self.assertEqual(adjusted.getN(), trades.getN())
+        self.assertEqual(adjusted.getSize(1), int(200 * 1.5))
+        self.assertAlmostEqual(adjusted.getPrice(40), trades.getPrice(40) / 2.0, 5)
+
+        ## rewrite emits back-to-back '>QHIf' records
+        recPath = os.path.join(self.workingDir, 'FAKE_trades.rec')
+        trades.rewrite(recPath, 7)
+        with gzip.open(recPath, 'rb') as f:
+            content = f.read()
+        self.assertEqual(len(content), 18 * 41)
+        ts, tickerId, size, price = struct.unpack_from('>QHIf', content, 18 * 40)
+        self.assertEqual(ts, 1182312000 * 1000 + 34240000)
+        self.assertEqual((tickerId, size), (7, 4100))
+        self.assertEqual(price, trades.getPrice(40))
+
+        quotes = TAQQuotesReader(self.quoteFile)
+        cleanedPath = os.path.join(self.workingDir, 'CLEAN_quotes.binRQ')
+        quotes.rewriteCleaned([1, 2], [3, 4], [5.5, 6.5], [7, 8], [9.5, 10.5], cleanedPath)
+        cleaned = TAQQuotesReader(cleanedPath)
+        self.assertEqual(cleaned.getN(), 2)
+        self.assertEqual(cleaned.getAskSize(1), 8)
+        self.assertEqual(cleaned.getBidPrice(0), 5.5)
+
+    def testCodecs(self):
+        quotes = TAQQuotesReader(self.quoteFile)
+        self.assertEqual(sniffCodec(self.quoteFile), 'gzip')
+        for codec in ['gzip:1', 'raw', 'lzma', 'bz2:1', TAQCodec('gzip', 0)]:
+            outPath = os.path.join(self.workingDir, 'CODEC_quotes.binRQ')
+            quotes.rewrite_adj(outPath, 1, 1, codec=codec)
+            self.assertEqual(sniffCodec(outPath), TAQCodec.parse(codec).codec)
+            copy = TAQQuotesReader(outPath)
+            self.assertTrue(np.array_equal(copy.getAskPriceArray(), quotes.getAskPriceArray()))
+            self.assertEqual(copy.getBidSize(40), 400)
+            self.assertEqual(TAQQuotesReader.peekN(outPath), 41)
+            self.assertEqual(TAQQuotesReader.peek(outPath).lastMillis, 34240000)
+        self.assertRaises(ValueError, TAQCodec.parse, 'zip')
+
+    def testAtomicWrite(self):
+        outPath = os.path.join(self.workingDir, 'ATOMIC_trades.binRT')
+        writeColumns(outPath, 1182312000, [[1], [2], [3.0]], TRADE_COLUMNS)
+        before = sorted(os.listdir(self.workingDir))
+        ## a write that fails half way leaves the old file and no temporary behind
+        self.assertRaises(ValueError, writeColumns, outPath, 1182312000,
+                          [[1, 2], ['x', 'y'], [3.0, 4.0]], TRADE_COLUMNS)
+        self.assertEqual(sorted(os.listdir(self.workingDir)), before)
+        self.assertEqual(TAQTradesReader(outPath).getN(), 1)
+        self.assertEqual(os.stat(outPath).st_mode & 0o777, os.stat(self.tradeFile).st_mode & 0o777)
+
+        ## every other output goes through the same helper, with the same permissions
+        outputs = [os.path.join(self.workingDir, name) for name in ['FAKE.outliers', 'trade.taqpack', 'run.manifest']]
+        writeOutliers(outputs[0], self.tradeFile, 21, 0.00005, 41, 0, 41, [3])
+        TAQPackStore.writePack(outputs[1], 'trade', [('FAKE', (1182312000, 1), np.zeros((3, 1)))])
+        TAQManifest(outputs[2]).save()
+        for output in outputs:
+            self.assertEqual(os.stat(output).st_mode & 0o777, os.stat(self.tradeFile).st_mode & 0o777)
+        before = sorted(os.listdir(self.workingDir))
+        self.assertRaises(ValueError, TAQPackStore.writePack, outputs[1], 'trade',
+                          [('FAKE', (1182312000, 2), np.zeros((3, 1)))])
+        self.assertEqual(sorted(os.listdir(self.workingDir)), before)
+
+    def testParallelGzip(self):
+        data = np.arange(100000, dtype='>i4').tobytes()
+        outPath = os.path.join(self.workingDir, 'parallel.gz')
+        ## small blocks so the stream is stitched from many of them
+        with ParallelGzipWriter(outPath, level=6, blockSize=4096, nThreads=3) as out:
+            out.write(data[:1001])
+            out.write(data[1001:])
+        with gzip.open(outPath, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+        quotes = TAQQuotesReader(self.quoteFile)
+        outPath = os.path.join(self.workingDir, 'PGZIP_quotes.binRQ')
+        quotes.rewrite_adj(outPath, 1, 1, codec='pgzip:1')
+        self.assertEqual(sniffCodec(outPath), 'gzip')
+        self.assertEqual(TAQQuotesReader.peekN(outPath), 41)
+        self.assertTrue(np.array_equal(TAQQuotesReader(outPath).getBidPriceArray(),
+                                       quotes.getBidPriceArray()))
+        self.assertRaises(ValueError, TAQCodec, 'raw', 1)
+
+    def testPackStore(self):
+        stageDir = os.path.join(self.workingDir, 'trade_SP_Adj')
+        dateDir = os.path.join(stageDir, '20070620')
+        os.makedirs(dateDir)
+        shutil.copy(self.tradeFile, dateDir)
+        TAQTradesReader(self.tradeFile).rewriteCleaned([34200000, 34201000], [1.5, 2.5], [10, 20],
+                                                       os.path.join(dateDir, 'ABC_trades.binRT'))
+        packs = TAQPackStore.packTree(stageDir)
+        self.assertEqual(packs, [os.path.join(stageDir + '_packed', '20070620.taqpack')])
+
+        pack = TAQPackStore.TAQPackFile(packs[0])
+        self.assertEqual(pack.type, 'trade')
+        self.assertEqual(pack.getTickers(), ['ABC', 'FAKE'])
+        self.assertEqual(pack.getN('ABC'), 2)
+        self.assertNotIn('IBM', pack)
+        reader = pack.getReader('FAKE')
+        original = TAQTradesReader(self.tradeFile)
+        self.assertEqual(reader.getN(), 41)
+        self.assertEqual(reader.getSecsFromEpocToMidn(), 1182312000)
+        for i in [0, 20, 40]:
+            self.assertEqual(reader.getMillisFromMidn(i), original.getMillisFromMidn(i))
+            self.assertEqual(reader.getSize(i), original.getSize(i))
+            self.assertEqual(reader.getPrice(i), original.getPrice(i))
+        self.assertEqual(pack.getReader('ABC').getPrice(1), 2.5)
+
+        ## and back to the directory layout
+        unpackedDir = os.path.join(self.workingDir, 'unpacked')
+        TAQPackStore.unpackPack(packs[0], unpackedDir)
+        self.assertEqual(sorted(os.listdir(unpackedDir)), ['ABC_trades.binRT', 'FAKE_trades.binRT'])
+        np.testing.assert_array_equal(
+            TAQTradesReader(os.path.join(unpackedDir, 'FAKE_trades.binRT')).getPriceArray(),
+            original.getPriceArray())
+
+        quoteDir = os.path.join(self.workingDir, 'quote_SP_Adj', '20070620')
+        os.makedirs(quoteDir)
+        shutil.copy(self.quoteFile, quoteDir)
+        quotePack = os.path.join(self.workingDir, 'quotes.taqpack')
+        self.assertEqual(TAQPackStore.packDateDir(quoteDir, quotePack), 1)
+        quotes = TAQPackStore.TAQPackFile(quotePack).getReader('FAKE')
+        np.testing.assert_array_equal(quotes.getAskSizeArray(),
+                                      TAQQuotesReader(self.quoteFile).getAskSizeArray())
+
+    def testTickerStore(self):
+        stageDir = os.path.join(self.workingDir, 'quote_SP_Adj')
+        for date in ['20070620', '20070621']:
+            os.makedirs(os.path.join(stageDir, date))
+            shutil.copy(self.quoteFile, os.path.join(stageDir, date))
+        storeDir = os.path.join(self.workingDir, 'store')
+        self.assertEqual(buildTickerStores(stageDir, storeDir), 2)
+        ## nothing new to append
+        self.assertEqual(buildTickerStores(stageDir, storeDir), 0)
+
+        store = TAQTickerStore(os.path.join(storeDir, 'quote_SP_Adj', 'FAKE'), 'quote')
+        self.assertEqual(store.getDates(), ['20070620', '20070621'])
+        self.assertEqual(store.getN(), 82)
+        original = TAQQuotesReader(self.quoteFile)
+        askPrices = store.getColumn('askPrice')
+        self.assertIsInstance(askPrices, np.memmap)
+        np.testing.assert_array_equal(askPrices[41:], original.getAskPriceArray())
+        reader = store.getReader('20070621')
+        self.assertEqual(reader.getN(), 41)
+        self.assertEqual(reader.getBidSize(3), original.getBidSize(3))
+        self.assertEqual(reader.getMillisFromMidn(40), 34240000)
+        with self.assertRaises(ValueError):
+            store.append('20070620', (1182312000, 0), [[]] * 5)
+
+        ## a later date appends to the same files, past any partial data left behind
+        with open(os.path.join(storeDir, 'quote_SP_Adj', 'FAKE', 'millis.col'), 'ab') as out:
+            out.write(b'junk')
+        os.makedirs(os.path.join(stageDir, '20070622'))
+        shutil.copy(self.quoteFile, os.path.join(stageDir, '20070622'))
+        self.assertEqual(buildTickerStores(stageDir, storeDir), 1)
+        store = TAQTickerStore(os.path.join(storeDir, 'quote_SP_Adj', 'FAKE'), 'quote')
+        self.assertEqual(store.getIndex()['start'].tolist(), [0, 41, 82])
+        np.testing.assert_array_equal(store.getColumn('millis')[82:], original.getMillisFromMidnArray())
+
+        ## a re-adjusted day and a backfilled date truncate the store back to them
+        original.rewrite_adj(os.path.join(stageDir, '20070621', 'FAKE_quotes.binRQ'), 1, 2)
+        os.makedirs(os.path.join(stageDir, '20070619'))
+        shutil.copy(self.quoteFile, os.path.join(stageDir, '20070619'))
+        self.assertEqual(buildTickerStores(stageDir, storeDir), 4)
+        self.assertEqual(buildTickerStores(stageDir, storeDir), 0)
+        store = TAQTickerStore(os.path.join(storeDir, 'quote_SP_Adj', 'FAKE'), 'quote')
+        self.assertEqual(store.getDates(), ['20070619', '20070620', '20070621', '20070622'])
+        np.testing.assert_allclose(store.getReader('20070621').getBidPriceArray(),
+                                   original.getBidPriceArray() / 2, rtol=1e-6)
+        np.testing.assert_array_equal(store.getReader('20070622').getBidPriceArray(), original.getBidPriceArray())
+
+        ## a stage of outlier files stores the rows they keep
+        cleanedDir = os.path.join(self.workingDir, 'quote_SP_Adj_cleaned')
+        writeOutliers(os.path.join(cleanedDir, '20070620', 'FAKE_quotes.binRQ.outliers'),
+                      os.path.join(stageDir, '20070620', 'FAKE_quotes.binRQ'), 21, 0.00005, 41, 0, 41, [3, 7])
+        self.assertEqual(buildTickerStores(cleanedDir, storeDir), 1)
+        store = TAQTickerStore(os.path.join(storeDir, 'quote_SP_Adj_cleaned', 'FAKE'), 'quote')
+        self.assertEqual(store.getN(), 39)
+        np.testing.assert_array_equal(store.getColumn('askSize'), np.delete(original.getAskSizeArray(), [3, 7]))
+
+    def testLjungBoxReader(self):
+        import AutoCorrelationAnalysis
+        ## one reader serves every frequency, with the column cache off
+        opened = []
+        def openTrades(filePathName, **kwargs):
+            opened.append(filePathName)
+            return TAQTradesReader(self.tradeFile, **kwargs)
+        analysis = AutoCorrelationAnalysis.AutoCorrelationAnalysis(self.workingDir)
+        with mock.patch.object(AutoCorrelationAnalysis, 'tr', openTrades):
+            result = analysis.testing_ljungbox('20070620', 'FAKE', [1, 2, 5, 10], [1, 2], plot_fig=False, verbose=False)
+        self.assertEqual(len(opened), 1)
+        self.assertEqual(result['freq'].tolist(), [1, 1, 2, 2, 5, 5, 10, 10])
+        dfResampled, n = analysis.computeStatWithFreq(self.tradeFile, 5)
+        self.assertEqual(n, 41)
+        self.assertEqual(len(dfResampled), 9)
+
+    def testColumnCache(self):
+        from AutoCorrelationAnalysis import AutoCorrelationAnalysis
+        ## off by default
+        self.assertEqual(TAQColumnCache.getCacheBudget(), 0)
+        TAQTradesReader(self.tradeFile).getPriceArray()
+        self.assertEqual(TAQColumnCache.getCacheStats().entries, 0)
+        TAQColumnCache.setCacheBudget(TAQColumnCache.SESSION_CACHE_BYTES)
+        self.addCleanup(os.environ.pop, TAQColumnCache.CACHE_BYTES_ENV, None)
+        TAQColumnCache.clearColumnCache()
+        TAQColumnCache.resetCacheStats()
+        analysis = AutoCorrelationAnalysis(self.workingDir)
+        for freq in [1, 2, 5, 10, 20, 30]:
+            analysis.computeStatWithFreq(self.tradeFile, freq, type='trade')
+        ## header, millis and price missed once; every later reader hit the header
+        ## twice (on open and on decode) and both columns
+        stats = TAQColumnCache.getCacheStats()
+        self.assertEqual(stats.misses, 3)
+        self.assertEqual(stats.hits, 1 + 5 * 4)
+        self.assertEqual(stats.entries, 3)
+
+        ## shared columns are read-only, native readers get their own copy
+        first = TAQTradesReader(self.tradeFile).getPriceArray()
+        self.assertTrue(np.shares_memory(first, TAQTradesReader(self.tradeFile).getPriceArray()))
+        self.assertFalse(first.flags.writeable)
+        native = TAQTradesReader(self.tradeFile, nativeEndian=True).getPriceArray()
+        self.assertTrue(native.dtype.isnative)
+        np.testing.assert_array_equal(native, first)
+
+        ## a rewritten file is decoded again
+        TAQTradesReader(self.tradeFile).rewriteCleaned([34200000], [3.5], [1], self.tradeFile)
+        self.assertEqual(TAQTradesReader(self.tradeFile).getPrice(0), 3.5)
+
+        ## the budget evicts least recently used columns first
+        TAQColumnCache.clearColumnCache()
+        TAQColumnCache.resetCacheStats()
+        try:
+            TAQColumnCache.setCacheBudget(2 * 4 * 41 + 64)
+            TAQQuotesReader(self.quoteFile).getBidPriceArray()
+            self.assertGreater(TAQColumnCache.getCacheStats().evictions, 0)
+            self.assertLessEqual(TAQColumnCache.getCacheStats().nbytes, 2 * 4 * 41 + 64)
+            TAQColumnCache.setCacheBudget(0)
+            self.assertEqual(TAQColumnCache.getCacheStats().entries, 0)
+            self.assertEqual(TAQQuotesReader(self.quoteFile).getBidSize(2), 20)
+        finally:
+            os.environ.pop(TAQColumnCache.CACHE_BYTES_ENV, None)
+
+    def testTimestamps(self):
+        reader = TAQQuotesReader(self.quoteFile)
+        index = millisToDatetimeIndex(reader.getSecsFromEpocToMidn(), reader.getMillisFromMidnArray(), name='Time')
+        midnight = datetime.datetime.fromtimestamp(reader.getSecsFromEpocToMidn())
+        self.assertEqual(list(index), [pd.Timestamp(midnight + datetime.timedelta(milliseconds=
+                                                        reader.getMillisFromMidn(i))) for i in range(41)])
+        self.assertEqual(index.name, 'Time')
+        self.assertEqual(len(millisToDatetimeIndex(reader.getSecsFromEpocToMidn(), [])), 0)
+
+if __name__ == '__main__':
+    unittest.main()
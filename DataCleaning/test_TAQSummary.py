@@ -1,5 +1,10 @@
 import unittest
+import tempfile
+import pandas as pd
+import shutil
 from TAQSummary import TAQSummary
+from TAQTickerStore import buildTickerStores
+from TAQCleaner import beginSweep
 import gzip
 import struct
 import os
@@ -115,6 +120,117 @@ class Test_TAQSummary(unittest.TestCase):
             self.assertAlmostEquals(dirtyQuoteStat[i],testDirtyQuoteStat[i],5)
         
 
+    def testTickCounts(self):
+        self.fake_data_generate()
+        workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/FakeData'
+        dirSuffix = '/DataSet/'
+        workingDir = workingDir + dirSuffix
+
+        taqSummary = TAQSummary('FAKE',workingDir,freq=1)
+        totalTrades, totalQuotes, fracTradeToQuote = taqSummary.computeTickCounts(ifCleaned=True)
+        self.assertEqual(totalTrades, 41)
+        self.assertEqual(totalQuotes, 41)
+        self.assertEqual(fracTradeToQuote, 1.0)
+        self.assertEqual(taqSummary.trade_nums, 41)
+
+        ## with a session window, the same counts as the statistics
+        windowed = TAQSummary('FAKE',workingDir,freq=1,sessionWindow=(3425000, 3450000))
+        windowed.computeStatForAllDatesWithFreq(ifCleaned=True, progress_bar=False)
+        counts = (windowed.trade_nums, windowed.quote_nums)
+        self.assertEqual(counts, (25, 25))
+        self.assertEqual(windowed.computeTickCounts(ifCleaned=True), counts + (1.0,))
+
+    def testSharedMemory(self):
+        self.fake_data_generate()
+        workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/FakeData'
+        dirSuffix = '/DataSet/'
+        workingDir = workingDir + dirSuffix
+
+        piped = TAQSummary('FAKE',workingDir,freq=1)
+        piped.computeStatForAllDatesWithFreq(ifCleaned=True, progress_bar=False)
+        shared = TAQSummary('FAKE',workingDir,freq=1)
+        shared.computeStatForAllDatesWithFreq(ifCleaned=True, progress_bar=False, sharedMemory=True)
+
+        self.assertEqual(shared.trade_nums, 41)
+        self.assertEqual(len(shared.quote_returns), 1)
+        pd.testing.assert_frame_equal(shared.trade_returns[0], piped.trade_returns[0], check_freq=False)
+        pd.testing.assert_frame_equal(shared.quote_returns[0], piped.quote_returns[0], check_freq=False)
+        piped.computeSummary()
+        shared.computeSummary()
+        for i in range(6):
+            self.assertAlmostEqual(piped.tradeStat[i], shared.tradeStat[i], 5)
+
+    def testTickerStore(self):
+        self.fake_data_generate()
+        workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/FakeData'
+        dirSuffix = '/DataSet/'
+        workingDir = workingDir + dirSuffix
+        storeDir = tempfile.mkdtemp()
+        try:
+            for stage in ['trade_SP_Adj_cleaned', 'quote_SP_Adj_cleaned']:
+                self.assertEqual(buildTickerStores(workingDir + stage, storeDir, tickers=['FAKE']), 1)
+
+            fromFiles = TAQSummary('FAKE',workingDir,freq=1)
+            fromFiles.computeStatForAllDatesWithFreq(ifCleaned=True, progress_bar=False)
+            fromFiles.computeSummary()
+            fromStore = TAQSummary('FAKE',workingDir,freq=1,storeDir=storeDir)
+            fromStore.computeStatForAllDatesWithFreq(ifCleaned=True)
+            fromStore.computeSummary()
+
+            self.assertEqual(fromStore.tradeFileList, ['20070620'])
+            self.assertEqual(fromStore.trade_nums, 41)
+            self.assertEqual(fromStore.quote_nums, 41)
+            for i in range(6):
+                self.assertAlmostEqual(fromFiles.tradeStat[i], fromStore.tradeStat[i], 5)
+                self.assertAlmostEqual(fromFiles.quotesStat[i], fromStore.quotesStat[i], 5)
+            self.assertEqual(fromStore.computeTickCounts(ifCleaned=True), (41, 41, 1.0))
+            windowed = TAQSummary('FAKE',workingDir,freq=1,storeDir=storeDir,sessionWindow=(3425000, 3450000))
+            windowed.computeStatForAllDatesWithFreq(ifCleaned=True)
+            counts = (windowed.trade_nums, windowed.quote_nums)
+            self.assertEqual(counts, (25, 25))
+            self.assertEqual(windowed.computeTickCounts(ifCleaned=True), counts + (1.0,))
+        finally:
+            shutil.rmtree(storeDir)
+
+    def testOutlierFiles(self):
+        self.fake_data_generate()
+        workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/FakeData'
+        dirSuffix = '/DataSet/'
+        workingDir = workingDir + dirSuffix
+        rewrittenDir = tempfile.mkdtemp() + '/'
+        outliersDir = tempfile.mkdtemp() + '/'
+        try:
+            ## the same cleaning, once rewriting the data and once as outlier files only
+            for treeDir, outliersOnly in [(rewrittenDir, False), (outliersDir, True)]:
+                for stage, fileName in [('trade_SP_Adj', 'FAKE_trades.binRT'), ('quote_SP_Adj', 'FAKE_quotes.binRQ')]:
+                    readingPath = os.path.join(treeDir, stage, '20070620', fileName)
+                    os.makedirs(os.path.dirname(readingPath))
+                    shutil.copy(os.path.join(workingDir, stage, '20070620', fileName), readingPath)
+                    beginSweep(readingPath, [21], [0.00005], outliersOnly=outliersOnly)
+            self.assertEqual(os.listdir(os.path.join(outliersDir, 'trade_SP_Adj_cleaned_21_5e-05', '20070620')),
+                             ['FAKE_trades.binRT.outliers'])
+
+            rewritten = TAQSummary('FAKE',rewrittenDir,freq=1)
+            rewritten.computeStatForAllDatesWithFreq(ifCleaned=True, K=21, gamma_multiplier=0.00005, progress_bar=False)
+            rewritten.computeSummary()
+            fromOutliers = TAQSummary('FAKE',outliersDir,freq=1)
+            fromOutliers.computeStatForAllDatesWithFreq(ifCleaned=True, K=21, gamma_multiplier=0.00005, progress_bar=False)
+            fromOutliers.computeSummary()
+
+            self.assertEqual(fromOutliers.trade_nums, 40)
+            ## the sanity filter also drops the first quote, whose sizes are 0
+            self.assertEqual(fromOutliers.quote_nums, 39)
+            pd.testing.assert_frame_equal(fromOutliers.trade_returns[0], rewritten.trade_returns[0])
+            pd.testing.assert_frame_equal(fromOutliers.quote_returns[0], rewritten.quote_returns[0])
+            for i in range(6):
+                self.assertAlmostEqual(rewritten.tradeStat[i], fromOutliers.tradeStat[i], 5)
+                self.assertAlmostEqual(rewritten.quotesStat[i], fromOutliers.quotesStat[i], 5)
+            self.assertEqual(fromOutliers.computeTickCounts(ifCleaned=True, K=21, gamma_multiplier=0.00005),
+                             (40, 39, 40 / 39))
+        finally:
+            shutil.rmtree(rewrittenDir)
+            shutil.rmtree(outliersDir)
+
 
 if __name__ == '__main__':
     workingDir = '/Users/barry/Desktop/NYU Courses/courseSpring2022/algo trading/hw1/FakeData'